@@ -0,0 +1,191 @@
+import argparse
+import csv
+import multiprocessing
+import os
+import sys
+import time
+import numpy as np
+from PIL import Image
+
+from components import splitLabels
+from image_loader import loadArray, frameCount, releaseArrays
+from object_table import ObjectTable
+from project import projectPairs
+
+# Per-mask statistics over a whole dataset, one CSV row per mask frame,
+# computed by a process pool with the same object extraction as the viewer.
+# The viewer's sidecar cache is left alone, so a whole dataset does not fill
+# it. Rows are written as soon as a pair is done, so an interrupted run is
+# resumed by running it again.
+
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+DEFAULT_AREA_BINS = "16,64,256,1024,4096,16384"
+SPLIT_IDS_SHOWN = 20
+
+
+def histogramFields(edges):
+    fields = [f"area_lt_{edges[0]}"]
+    fields += [f"area_{low}_{high}" for low, high in zip(edges[:-1], edges[1:])]
+    fields.append(f"area_ge_{edges[-1]}")
+    return fields
+
+
+def statsFields(edges):
+    return [
+        "image",
+        "mask",
+        "frame",
+        "status",
+        "error",
+        "height",
+        "width",
+        "dtype",
+        "image_shape_match",
+        "objects",
+        "labelled_pixels",
+        "labelled_fraction",
+        "min_area",
+        "median_area",
+        "max_area",
+        "empty",
+        "split_labels",
+        "split_label_ids",
+    ] + histogramFields(edges)
+
+
+def frameStats(maskArray, edges, checkSplit):
+    table = ObjectTable.fromMask(maskArray)
+    areas = table.pixelCounts
+    height, width = maskArray.shape[:2]
+    row = {
+        "height": height,
+        "width": width,
+        "dtype": str(maskArray.dtype),
+        "objects": len(table),
+        "labelled_pixels": int(areas.sum()),
+        "labelled_fraction": f"{areas.sum() / max(height * width, 1):.6f}",
+        "min_area": int(areas.min()) if len(areas) else "",
+        "median_area": float(np.median(areas)) if len(areas) else "",
+        "max_area": int(areas.max()) if len(areas) else "",
+        "empty": int(len(table) == 0),
+    }
+    if checkSplit:
+        splitIds, _ = splitLabels(maskArray)
+        row["split_labels"] = len(splitIds)
+        row["split_label_ids"] = ";".join(str(obj) for obj in splitIds[:SPLIT_IDS_SHOWN].tolist())
+    bins = np.concatenate([[0], edges, [np.iinfo(np.int64).max]])
+    counts, _ = np.histogram(areas, bins=bins)
+    row.update(zip(histogramFields(edges), counts.tolist()))
+    return row
+
+
+def pairStats(job):
+    # Runs in a pool worker: every frame of one image/mask pair
+    imagePath, maskPath, edges, checkSplit = job
+    base = {"image": imagePath, "mask": maskPath}
+    try:
+        with Image.open(imagePath) as image:
+            imageSize = image.size
+        rows = []
+        for frame in range(frameCount(maskPath)):
+            maskArray = loadArray(maskPath, frame)
+            row = dict(base, frame=frame, status=STATUS_OK, error="")
+            row["image_shape_match"] = int(imageSize == (maskArray.shape[1], maskArray.shape[0]))
+            row.update(frameStats(maskArray, edges, checkSplit))
+            rows.append(row)
+        return rows
+    except Exception as e:
+        return [dict(base, frame="", status=STATUS_ERROR, error=f"{type(e).__name__}: {e}")]
+    finally:
+        releaseArrays()
+
+
+def readDone(path, retryErrors):
+    # Pairs already in an earlier output. With retryErrors the failed ones are
+    # removed from the file so they are written again.
+    if not os.path.exists(path):
+        return set()
+    with open(path, mode="r", newline="", encoding="utf-8") as file:
+        rows = list(csv.DictReader(file))
+    if retryErrors:
+        failed = {(row["image"], row["mask"]) for row in rows if row["status"] == STATUS_ERROR}
+        if failed:
+            kept = [row for row in rows if (row["image"], row["mask"]) not in failed]
+            temporaryPath = path + ".tmp"
+            with open(temporaryPath, mode="w", newline="", encoding="utf-8") as file:
+                writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(kept)
+            os.replace(temporaryPath, path)
+            rows = kept
+    return {(row["image"], row["mask"]) for row in rows}
+
+
+def checkHeader(path, fields):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return False
+    with open(path, mode="r", newline="", encoding="utf-8") as file:
+        header = next(csv.reader(file), [])
+    if header != fields:
+        sys.exit(f"{path} was written with other options, use another --output")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Object statistics for every mask of a dataset")
+    parser.add_argument("project", help="project folder or manifest CSV, as for Open Project")
+    parser.add_argument("--output", default="batch_stats.csv")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--area-bins", default=DEFAULT_AREA_BINS, help="comma separated area bin edges")
+    parser.add_argument("--no-split-check", action="store_true", help="skip the connected piece check")
+    parser.add_argument("--retry-errors", action="store_true", help="run pairs that failed before again")
+    args = parser.parse_args()
+
+    edges = sorted(int(edge) for edge in args.area_bins.split(","))
+    fields = statsFields(edges)
+    pairs, _ = projectPairs(args.project)
+    hasHeader = checkHeader(args.output, fields)
+    done = readDone(args.output, args.retry_errors) if hasHeader else set()
+    jobs = [
+        (imagePath, maskPath, edges, not args.no_split_check)
+        for imagePath, maskPath in pairs
+        if (imagePath, maskPath) not in done
+    ]
+    print(f"{len(pairs)} pairs, {len(pairs) - len(jobs)} already done", file=sys.stderr)
+
+    totals = np.zeros(len(edges) + 1, dtype=np.int64)
+    objects = empty = split = errors = 0
+    start = time.perf_counter()
+    with open(args.output, mode="a", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=fields)
+        if not hasHeader:
+            writer.writeheader()
+        with multiprocessing.Pool(max(args.workers, 1)) as pool:
+            for finished, rows in enumerate(pool.imap_unordered(pairStats, jobs), start=1):
+                writer.writerows(rows)
+                file.flush()
+                for row in rows:
+                    if row["status"] == STATUS_ERROR:
+                        errors += 1
+                        continue
+                    objects += row["objects"]
+                    empty += row["empty"]
+                    split += row.get("split_labels", 0)
+                    totals += [row[name] for name in histogramFields(edges)]
+                print(
+                    f"\r{finished}/{len(jobs)} pairs, {time.perf_counter() - start:.0f}s",
+                    end="",
+                    file=sys.stderr,
+                )
+    print(file=sys.stderr)
+    print(
+        f"{objects} objects, {empty} empty masks, {split} split labels, {errors} errors",
+        file=sys.stderr,
+    )
+    for name, count in zip(histogramFields(edges), totals.tolist()):
+        print(f"{name:<20} {count}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
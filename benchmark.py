@@ -0,0 +1,266 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from PIL import Image
+
+import mask_cache
+from image_loader import releaseArrays
+from label_core import LabelPair
+from review_state import STATE_YES, STATE_NO
+
+# Times the Qt-free core of the load, navigation and hover paths on synthetic
+# image/mask pairs and prints one JSON record per path. The GUI methods map to:
+#   load               LabelPair(...)              (loadImage, file mapping)
+#   extractObjects     LabelPair.extractObjects    (cold and cached sidecar)
+#   Worker.run         LabelPair.buildPyramids
+#   overlayTile        LabelPair.renderOverlay     (one 512x512 tile)
+#   changeMask         LabelPair.renderObjectCrop
+#   drawBoundingBox    ObjectTable.bbox
+#   highlightSingleObject  indexOf + renderObjectCrop at a labelled pixel
+#   mergeMaskAndImage  LabelPair.buildMergePyramid (first click, later ones are cached)
+#   loadInfo           LabelPair.applyProgressRows (replaces colorListItems)
+
+# Generator parameters that must match for --compare to use a baseline record
+CONFIG_FIELDS = ("height", "width", "objects", "dtype", "object_size", "seed")
+
+
+def syntheticPair(directory, height, width, objectCount, dtype, objectSize, seed):
+    rng = np.random.default_rng(seed)
+    mask = np.zeros((height, width), dtype=dtype)
+    radius = max(objectSize // 2, 1)
+    yy, xx = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+    disk = yy ** 2 + xx ** 2 <= radius ** 2
+    rows = rng.integers(0, max(height - 2 * radius, 1), objectCount)
+    cols = rng.integers(0, max(width - 2 * radius, 1), objectCount)
+    for label, (row, col) in enumerate(zip(rows.tolist(), cols.tolist()), start=1):
+        window = mask[row:row + disk.shape[0], col:col + disk.shape[1]]
+        window[disk[:window.shape[0], :window.shape[1]]] = label
+
+    image = rng.integers(0, 12000, (height, width), dtype=np.uint16)
+    image[mask != 0] += 30000
+
+    imagePath = os.path.join(directory, "image.tif")
+    maskPath = os.path.join(directory, "mask.tif")
+    Image.fromarray(image).save(imagePath)
+    Image.fromarray(mask).save(maskPath)
+    return imagePath, maskPath
+
+
+def measure(function, repeat):
+    # Wall times of every run, and the peak traced allocation of the first one
+    times = []
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return result, np.array(times), peak
+
+
+def record(name, times, peak, pixels=None, calls=1):
+    perCall = times / calls
+    entry = {
+        "path": name,
+        "runs": len(times),
+        "calls_per_run": calls,
+        "min_s": float(perCall.min()),
+        "median_s": float(np.median(perCall)),
+        "p95_s": float(np.percentile(perCall, 95)),
+        "peak_bytes": int(peak),
+    }
+    if pixels:
+        entry["mpixels_per_s"] = float(pixels / np.median(times) / 1e6)
+    else:
+        entry["calls_per_s"] = float(calls / np.median(times))
+    return entry
+
+
+def gitCommit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def runBenchmarks(args):
+    with tempfile.TemporaryDirectory() as directory:
+        mask_cache.CACHE_DIR = os.path.join(directory, "cache")
+        imagePath, maskPath = syntheticPair(
+            directory, args.height, args.width, args.objects, np.dtype(args.dtype),
+            args.object_size, args.seed,
+        )
+        pixels = args.height * args.width
+        results = []
+
+        def load():
+            releaseArrays()
+            return LabelPair(imagePath, maskPath)
+
+        pair, times, peak = measure(load, args.repeat)
+        results.append(record("load", times, peak, pixels))
+
+        def extractCold():
+            shutil.rmtree(mask_cache.CACHE_DIR, ignore_errors=True)
+            pair.frameData.clear()
+            pair.extractObjects()
+
+        _, times, peak = measure(extractCold, args.repeat)
+        results.append(record("extractObjects", times, peak, pixels))
+
+        def extractCached():
+            pair.frameData.clear()
+            pair.extractObjects()
+
+        _, times, peak = measure(extractCached, args.repeat)
+        results.append(record("extractObjects_cached", times, peak, pixels))
+
+        def buildPyramids():
+            for pyramid in (pair.maskPyramid, pair.imagePyramid):
+                del pyramid.levels[1:]
+            for _ in pair.buildPyramids():
+                pass
+
+        _, times, peak = measure(buildPyramids, args.repeat)
+        results.append(record("Worker.run", times, peak, pixels))
+
+        tile = pair.maskArray[:512, :512]
+        _, times, peak = measure(lambda: pair.renderOverlay(tile), args.repeat)
+        results.append(record("overlayTile", times, peak, tile.size))
+
+        rng = np.random.default_rng(args.seed)
+        objectCount = len(pair.objects)
+        sample = rng.integers(0, objectCount, min(args.calls, objectCount)).tolist()
+
+        def crops():
+            for index in sample:
+                pair.renderObjectCrop(index)
+
+        _, times, peak = measure(crops, args.repeat)
+        results.append(record("changeMask", times, peak, calls=len(sample)))
+
+        def boxes():
+            for index in sample:
+                pair.objectTable.bbox(index)
+
+        _, times, peak = measure(boxes, args.repeat)
+        results.append(record("drawBoundingBox", times, peak, calls=len(sample)))
+
+        centroids = np.round(pair.objectTable.centroids[sample]).astype(int)
+
+        def hovers():
+            for row, col in centroids.tolist():
+                index = pair.objectTable.indexOf(pair.maskArray[row, col])
+                if index >= 0:
+                    pair.renderObjectCrop(index)
+
+        _, times, peak = measure(hovers, args.repeat)
+        results.append(record("highlightSingleObject", times, peak, calls=len(sample)))
+
+        def merge():
+            pair.mergePyramid = None
+            pair.buildMergePyramid()
+
+        _, times, peak = measure(merge, args.repeat)
+        results.append(record("mergeMaskAndImage", times, peak, pixels))
+
+        marked = rng.permutation(objectCount)[: objectCount // 2]
+        for index in marked.tolist():
+            pair.mark(index, STATE_NO if index % 7 == 0 else STATE_YES, "note" if index % 7 == 0 else "")
+        rows = pair.progressRows(0)
+        _, times, peak = measure(lambda: pair.applyProgressRows(rows), args.repeat)
+        results.append(record("loadInfo", times, peak, calls=1))
+        releaseArrays()
+
+    return results
+
+
+def configKey(entry):
+    # Runs are only comparable with the same synthetic data
+    return (entry["path"],) + tuple(entry.get(name) for name in CONFIG_FIELDS)
+
+
+def compare(results, context, baselinePath, maxSlowdown):
+    with open(baselinePath, encoding="utf-8") as file:
+        baseline = {configKey(entry): entry for entry in map(json.loads, file) if "path" in entry}
+    slower = []
+    compared = 0
+    for entry in results:
+        previous = baseline.get(configKey({**context, **entry}))
+        if not previous:
+            continue
+        compared += 1
+        ratio = entry["median_s"] / previous["median_s"] if previous["median_s"] else 1.0
+        print(f"{entry['path']:<24} {ratio:6.2f}x", file=sys.stderr)
+        if ratio > maxSlowdown:
+            slower.append(entry["path"])
+    if not compared:
+        print(f"No run in {baselinePath} used the same configuration", file=sys.stderr)
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark label checker hot paths")
+    parser.add_argument("--height", type=int, default=2048)
+    parser.add_argument("--width", type=int, default=2048)
+    parser.add_argument("--objects", type=int, default=5000)
+    parser.add_argument("--dtype", default="uint16", choices=["uint8", "uint16", "uint32"])
+    parser.add_argument("--object-size", type=int, default=16, help="object diameter in pixels")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--calls", type=int, default=200, help="objects sampled per navigation run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="append JSON lines to this file instead of stdout")
+    parser.add_argument("--compare", help="JSON lines from an earlier run to compare against")
+    parser.add_argument("--max-slowdown", type=float, default=1.25)
+    args = parser.parse_args()
+    if args.objects > np.iinfo(args.dtype).max:
+        parser.error(f"--objects does not fit in {args.dtype}")
+
+    results = runBenchmarks(args)
+    context = {
+        "commit": gitCommit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "height": args.height,
+        "width": args.width,
+        "objects": args.objects,
+        "dtype": args.dtype,
+        "object_size": args.object_size,
+        "seed": args.seed,
+    }
+    lines = [json.dumps({**context, **entry}) for entry in results]
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+    else:
+        print("\n".join(lines))
+
+    if args.compare:
+        slower = compare(results, context, args.compare, args.max_slowdown)
+        if slower:
+            print(f"Slower than baseline: {', '.join(slower)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
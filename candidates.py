@@ -0,0 +1,69 @@
+import numpy as np
+from components import labelComponents
+from object_table import ObjectTable
+
+# Blobs smaller than this are treated as noise
+MIN_CANDIDATE_AREA = 20
+
+
+def otsuThreshold(values, bins=256):
+    # Threshold maximising the between-class variance of the histogram
+    values = values.ravel()
+    low, high = float(values.min()), float(values.max())
+    if low == high:
+        return low
+    hist, edges = np.histogram(values, bins=bins, range=(low, high))
+    centers = (edges[:-1] + edges[1:]) / 2
+    weightBelow = np.cumsum(hist)
+    weightAbove = weightBelow[-1] - weightBelow
+    sumBelow = np.cumsum(hist * centers)
+    meanBelow = sumBelow / np.maximum(weightBelow, 1)
+    meanAbove = (sumBelow[-1] - sumBelow) / np.maximum(weightAbove, 1)
+    between = weightBelow * weightAbove * (meanBelow - meanAbove) ** 2
+    return float(edges[np.argmax(between) + 1])
+
+
+def grayscale(array):
+    return array.mean(axis=2, dtype=np.float32) if array.ndim == 3 else array.astype(np.float32)
+
+
+def detectCandidates(
+    imageArray, maskArray, sampleImage, sampleMask, minArea=MIN_CANDIDATE_AREA, chunkPixels=1 << 22
+):
+    # Foreground blobs of the image that no label covers or touches, as an ObjectTable.
+    # The threshold and whether cells are brighter or darker than the
+    # background are taken from a downsampled copy of the image and mask.
+    sample = grayscale(sampleImage)
+    threshold = otsuThreshold(sample)
+    labelled = sampleMask != 0
+    bright = True
+    if labelled.any() and not labelled.all():
+        bright = sample[labelled].mean() >= sample[~labelled].mean()
+
+    height, width = maskArray.shape
+    foreground = np.empty((height, width), dtype=bool)
+    step = max(1, chunkPixels // max(width, 1))
+    for top in range(0, height, step):
+        block = grayscale(imageArray[top:top + step])
+        rows = foreground[top:top + step]
+        if bright:
+            np.greater(block, threshold, out=rows)
+        else:
+            np.less(block, threshold, out=rows)
+
+        # Labels grown by one pixel, so their own edges are not reported
+        labelled = maskArray[max(top - 1, 0):top + step + 1] != 0
+        covered = labelled.copy()
+        covered[1:] |= labelled[:-1]
+        covered[:-1] |= labelled[1:]
+        covered[:, 1:] |= labelled[:, :-1]
+        covered[:, :-1] |= labelled[:, 1:]
+        first = 1 if top else 0
+        rows &= ~covered[first:first + len(rows)]
+
+    components = labelComponents(foreground)
+    areas = np.bincount(components.ravel())
+    small = areas < minArea
+    small[0] = False
+    components[small[components]] = 0
+    return ObjectTable.fromMask(components)
@@ -0,0 +1,89 @@
+import numpy as np
+
+
+def labelRuns(labels, chunkPixels=1 << 22):
+    # Horizontal runs of equal non-zero values as (rows, starts, ends, values),
+    # ends exclusive, ordered by row then start
+    height, width = labels.shape
+    step = max(1, chunkPixels // max(width, 1))
+    parts = []
+    for top in range(0, height, step):
+        block = np.asarray(labels[top:top + step])
+        isStart = np.ones(block.shape, dtype=bool)
+        isStart[:, 1:] = block[:, 1:] != block[:, :-1]
+        blockRows, blockStarts = np.nonzero(isStart)
+        flatStarts = blockRows * width + blockStarts
+        flatEnds = np.append(flatStarts[1:], block.size)
+        blockEnds = np.minimum(flatEnds - blockRows * width, width)
+        values = block[blockRows, blockStarts]
+        keep = values != 0
+        parts.append((blockRows[keep] + top, blockStarts[keep], blockEnds[keep], values[keep]))
+    if not parts:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty, empty, np.empty(0, dtype=labels.dtype)
+    return tuple(np.concatenate(part) for part in zip(*parts))
+
+
+def runComponents(rows, starts, ends, values, width):
+    # Component id of every run, where runs with the same value touching
+    # vertically (4-connectivity) belong to the same component
+    count = len(rows)
+    if not count:
+        return np.empty(0, dtype=np.intp)
+
+    # Runs grouped by (row, value), sorted by start inside each group
+    groupKeys = rows.astype(np.int64) * (int(values.max()) + 1) + values.astype(np.int64)
+    order = np.lexsort((starts, groupKeys))
+    uniqueKeys, groups = np.unique(groupKeys[order], return_inverse=True)
+    span = np.int64(width + 1)
+    startKeys = groups * span + starts[order]
+    endKeys = groups * span + ends[order]
+
+    # Runs of the row above with the same value that overlap each run
+    aboveKeys = groupKeys - (int(values.max()) + 1)
+    position = np.minimum(np.searchsorted(uniqueKeys, aboveKeys), len(uniqueKeys) - 1)
+    hasAbove = (rows > 0) & (uniqueKeys[position] == aboveKeys)
+    below = np.flatnonzero(hasAbove)
+    aboveGroups = position[below].astype(np.int64)
+    low = np.searchsorted(endKeys, aboveGroups * span + starts[below], side="right")
+    high = np.searchsorted(startKeys, aboveGroups * span + ends[below], side="left")
+    overlaps = np.maximum(high - low, 0)
+    first = np.repeat(below, overlaps)
+    offsets = np.arange(overlaps.sum()) - np.repeat(np.cumsum(overlaps) - overlaps, overlaps)
+    second = order[np.repeat(low, overlaps) + offsets]
+
+    # Union-find by repeated min-label propagation with pointer jumping
+    parent = np.arange(count)
+    while True:
+        smaller = np.minimum(parent[first], parent[second])
+        updated = parent.copy()
+        np.minimum.at(updated, first, smaller)
+        np.minimum.at(updated, second, smaller)
+        updated = updated[updated]
+        if np.array_equal(updated, parent):
+            break
+        parent = updated
+    return np.unique(parent, return_inverse=True)[1]
+
+
+def splitLabels(labels):
+    # Labels whose pixels form more than one connected piece, with the number
+    # of pieces of each
+    rows, starts, ends, values = labelRuns(labels)
+    components = runComponents(rows, starts, ends, values, labels.shape[1])
+    pieces = np.unique(np.stack([values.astype(np.int64), components]), axis=1)
+    ids, counts = np.unique(pieces[0], return_counts=True)
+    split = counts > 1
+    return ids[split], counts[split]
+
+
+def labelComponents(binary):
+    # 4-connected components of a boolean image, numbered from 1
+    rows, starts, ends, values = labelRuns(binary.view(np.uint8))
+    components = runComponents(rows, starts, ends, values, binary.shape[1])
+    labels = np.zeros(binary.shape, dtype=np.int32)
+    lengths = ends - starts
+    offsets = np.cumsum(lengths) - lengths
+    positions = np.repeat(rows * binary.shape[1] + starts - offsets, lengths) + np.arange(lengths.sum())
+    labels.ravel()[positions] = np.repeat(components + 1, lengths)
+    return labels
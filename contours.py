@@ -0,0 +1,98 @@
+import numpy as np
+
+
+def _mergeRuns(labels, lines, starts):
+    # Join unit edges that continue each other on the same line for the same
+    # label into one (label, line, start, end) run
+    if not len(labels):
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, empty
+    order = np.lexsort((starts, lines, labels))
+    labels, lines, starts = labels[order], lines[order], starts[order]
+    breaks = np.ones(len(labels), dtype=bool)
+    breaks[1:] = (
+        (labels[1:] != labels[:-1])
+        | (lines[1:] != lines[:-1])
+        | (starts[1:] != starts[:-1] + 1)
+    )
+    first = np.flatnonzero(breaks)
+    last = np.append(first[1:], len(labels)) - 1
+    return labels[first], lines[first], starts[first], starts[last] + 1
+
+
+class ObjectContours:
+    # Outline of every object as axis-aligned segments along pixel edges.
+    # segments rows are (x1, y1, x2, y2) in scene coordinates, grouped by the
+    # object's dense index: object i owns segments[offsets[i]:offsets[i + 1]].
+
+    def __init__(self, segments, offsets):
+        self.segments = segments
+        self.offsets = offsets
+
+    @classmethod
+    def fromMask(cls, maskArray, objectTable, chunkPixels=1 << 22):
+        # One neighbour-difference pass over blocks of rows: an edge lies
+        # between two pixels with different labels and belongs to both
+        height, width = maskArray.shape
+        step = max(1, chunkPixels // max(width, 1))
+        horizontal = ([], [], [])
+        vertical = ([], [], [])
+
+        def collect(target, labels, lines, starts):
+            keep = labels != 0
+            target[0].append(labels[keep].astype(np.int64))
+            target[1].append(lines[keep])
+            target[2].append(starts[keep])
+
+        for top in range(0, height, step):
+            block = maskArray[top:top + step]
+            above = maskArray[top - 1:top] if top else np.zeros((1, width), maskArray.dtype)
+            below = maskArray[top + step:top + step + 1]
+            if not len(below):
+                below = np.zeros((1, width), maskArray.dtype)
+            rows = np.concatenate([above, block, below])
+
+            # Edges on the line y between row y - 1 and row y, plus the bottom
+            # of the last row of the block
+            ys, xs = np.nonzero(rows[1:] != rows[:-1])
+            if top + step < height:
+                keep = ys < len(block)
+                ys, xs = ys[keep], xs[keep]
+            upper = rows[ys, xs]
+            lower = rows[ys + 1, xs]
+            ys += top
+            collect(horizontal, upper, ys, xs)
+            collect(horizontal, lower, ys, xs)
+
+            # Edges on the line x between column x - 1 and column x
+            padded = np.zeros((len(block), width + 2), maskArray.dtype)
+            padded[:, 1:-1] = block
+            ys, xs = np.nonzero(padded[:, 1:] != padded[:, :-1])
+            left = padded[ys, xs]
+            right = padded[ys, xs + 1]
+            ys += top
+            collect(vertical, left, xs, ys)
+            collect(vertical, right, xs, ys)
+
+        hLabels, hLines, hStarts, hEnds = _mergeRuns(*(np.concatenate(part) for part in horizontal))
+        vLabels, vLines, vStarts, vEnds = _mergeRuns(*(np.concatenate(part) for part in vertical))
+
+        labels = np.concatenate([hLabels, vLabels])
+        segments = np.concatenate(
+            [
+                np.stack([hStarts, hLines, hEnds, hLines], axis=1),
+                np.stack([vLines, vStarts, vLines, vEnds], axis=1),
+            ]
+        ).astype(np.int32)
+        indices = objectTable.indicesOf(labels)
+        order = np.argsort(indices, kind="stable")
+        counts = np.bincount(indices, minlength=len(objectTable))
+        offsets = np.zeros(len(objectTable) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return cls(segments[order], offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def segmentsOf(self, index):
+        return self.segments[self.offsets[index]:self.offsets[index + 1]]
@@ -1,7 +1,7 @@
 from PyQt5.QtWidgets import QGraphicsView, QGraphicsRectItem, QApplication
 from PyQt5.QtCore import Qt, QRectF
 from PyQt5.QtGui import QPen, QColor
-import numpy as np
+from profiler import profiled
 
 
 class CustomGraphicsView(QGraphicsView):
@@ -40,6 +40,8 @@ class CustomGraphicsView(QGraphicsView):
             self.parent.markObjectNo()
         elif event.key() == Qt.Key_H:
             self.parent.toggleMask()
+        elif event.key() == Qt.Key_C:
+            self.parent.toggleOutlines()
         elif event.key() == Qt.Key_E:
             self.zoomIn()
         elif event.key() == Qt.Key_Q:
@@ -64,27 +66,30 @@ class CustomGraphicsView(QGraphicsView):
             if (
                 x >= 0
                 and y >= 0
-                and x < self.parent.maskArray.shape[1]
-                and y < self.parent.maskArray.shape[0]
+                and x < self.parent.pair.maskArray.shape[1]
+                and y < self.parent.pair.maskArray.shape[0]
             ):
-                obj = self.parent.maskArray[y, x]
+                obj = self.parent.pair.maskArray[y, x]
                 if obj != 0:
                     self.parent.selectObjectById(obj)
         super().mouseDoubleClickEvent(event)
 
-    def drawBoundingBox(self, obj_id):
+    @profiled()
+    def drawBoundingBox(self, index, table=None):
         if self.boundingBox:
             self.scene().removeItem(self.boundingBox)
-        maskClone = self.parent.maskArray == obj_id
-        indices = np.where(maskClone)
-        if len(indices[0]) == 0 or len(indices[1]) == 0:
+            self.boundingBox = None
+        if index < 0:
             return
-        minRow, maxRow = indices[0].min(), indices[0].max()
-        minCol, maxCol = indices[1].min(), indices[1].max()
+        if table is None:
+            table = self.parent.pair.objectTable
+        minRow, minCol, maxRow, maxCol = table.bbox(index)
         boundingRect = QRectF(minCol, minRow, maxCol - minCol + 1, maxRow - minRow + 1)
         pen = QPen(QColor("red"))
         pen.setWidth(1)
         pen.setJoinStyle(Qt.MiterJoin)
         self.boundingBox = QGraphicsRectItem(boundingRect)
         self.boundingBox.setPen(pen)
+        # Above the merge view, so candidates can be reviewed on it
+        self.boundingBox.setZValue(1)
         self.scene().addItem(self.boundingBox)
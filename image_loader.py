@@ -0,0 +1,107 @@
+import os
+import threading
+import numpy as np
+from PIL import Image
+from lru_cache import LRUCache
+
+# Whole-slide images are far beyond PIL's decompression bomb limit
+Image.MAX_IMAGE_PIXELS = None
+
+# PIL raw modes whose bytes can be viewed directly as a numpy array
+RAW_DTYPES = {
+    "L": ("u1", 1),
+    "I;8": ("u1", 1),
+    "I;16": ("<u2", 1),
+    "I;16B": (">u2", 1),
+    "I;16N": ("=u2", 1),
+    "I;16S": ("<i2", 1),
+    "I;16BS": (">i2", 1),
+    "I;32": ("<u4", 1),
+    "I;32B": (">u4", 1),
+    "I;32S": ("<i4", 1),
+    "I;32BS": (">i4", 1),
+    "F;32F": ("<f4", 1),
+    "F;32BF": (">f4", 1),
+    "RGB": ("u1", 3),
+    "RGBA": ("u1", 4),
+}
+
+# Decoded pages kept in memory across pairs and frames, memory maps cost nothing
+SHARED_ARRAY_BYTES = 1024 * 1024 * 1024
+
+# One array per file page, keyed by path, size, mtime and frame
+_sharedArrays = LRUCache(
+    SHARED_ARRAY_BYTES, lambda array: 0 if isinstance(array, np.memmap) else array.nbytes
+)
+_sharedLock = threading.Lock()
+
+
+def _fileKey(path):
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return path, stat.st_size, stat.st_mtime_ns
+
+
+def mapRawImage(image, path):
+    # Memory map an uncompressed image whose strips are stored back to back,
+    # return None when the layout needs decoding
+    tiles = sorted(image.tile, key=lambda tile: tile[1][1])
+    if not tiles or any(tile[0] != "raw" for tile in tiles):
+        return None
+    rawmode = tiles[0][3][0]
+    if rawmode not in RAW_DTYPES or any(tile[3][0] != rawmode for tile in tiles):
+        return None
+    dtype, channels = RAW_DTYPES[rawmode]
+    dtype = np.dtype(dtype)
+    width, height = image.size
+    rowBytes = width * channels * dtype.itemsize
+
+    firstOffset = tiles[0][2]
+    for extents, offset, args in ((tile[1], tile[2], tile[3]) for tile in tiles):
+        x0, y0, x1, _ = extents
+        stride = args[1] if len(args) > 1 else 0
+        ystep = args[2] if len(args) > 2 else 1
+        if x0 != 0 or x1 != width or stride not in (0, rowBytes) or ystep != 1:
+            return None
+        if offset != firstOffset + y0 * rowBytes:
+            return None
+    if tiles[0][1][1] != 0 or tiles[-1][1][3] != height:
+        return None
+
+    shape = (height, width) if channels == 1 else (height, width, channels)
+    return np.memmap(path, dtype=dtype, mode="r", offset=firstOffset, shape=shape)
+
+
+def frameCount(path):
+    # Pages of a multi-page TIFF (z-stack or time-lapse), 1 for plain images
+    with Image.open(path) as image:
+        return getattr(image, "n_frames", 1)
+
+
+def openArray(path, frame=0):
+    # Only the requested page is decoded
+    with Image.open(path) as image:
+        image.seek(frame)
+        array = mapRawImage(image, path)
+        if array is None:
+            array = np.asarray(image)
+    return array
+
+
+def loadArray(path, frame=0):
+    key = _fileKey(path) + (frame,)
+    with _sharedLock:
+        array = _sharedArrays.get(key)
+    if array is None:
+        array = openArray(path, frame)
+        with _sharedLock:
+            _sharedArrays.put(key, array)
+    return array
+
+
+def releaseArrays(keepPaths=()):
+    keep = {os.path.abspath(path) for path in keepPaths}
+    with _sharedLock:
+        for key in list(_sharedArrays.entries):
+            if key[0] not in keep:
+                _sharedArrays.pop(key)
@@ -1,3 +1,4 @@
+import importlib
 import os
 from PyQt5.QtWidgets import (
     QFileDialog,
@@ -14,18 +15,26 @@ from PyQt5.QtWidgets import (
     QLabel,
     QSlider,
     QLineEdit,
-    QListWidget,
-    QListWidgetItem,
+    QListView,
     QProgressBar,
     QSplitter,
+    QComboBox,
+    QTabWidget,
 )
-from PyQt5.QtGui import QPixmap, QFont, QColor, QTextCursor
+from PyQt5.QtGui import QPixmap, QFont, QTextCursor, QColor
 from PyQt5.QtCore import Qt, QRectF, QThread
-import csv
-import numpy as np
-from PIL import Image
 from custom_graphics_view import CustomGraphicsView
-from worker import Worker
+from worker import Worker, CandidateWorker
+from object_list_model import ObjectListModel, CandidateListModel, METRICS
+from review_fields import STATE_UNCHECKED, STATE_YES, STATE_NO, STATE_NAMES
+from overlay_prefetch import OverlayPrefetcher, PREFETCH_RADIUS
+from profiler import Span, profiled, isEnabled as isProfiling
+from project import Project, STATUS_IN_PROGRESS, STATUS_DONE, TIFF_EXTENSIONS, orderPair
+
+# numpy, PIL and everything built on them (LabelPair, the scene items) are
+# imported where they are first used, so the window is shown before the
+# analysis stack is loaded. See warmUp.
+ANALYSIS_MODULES = ("label_core", "scene_items", "journal")
 
 
 class ImageViewer(QWidget):
@@ -50,6 +59,10 @@ class ImageViewer(QWidget):
         splitter.addWidget(rightWidget)
         splitter.setStretchFactor(0, 4)
 
+        self.labelProject = QLabel("")
+        leftLayout.addWidget(self.labelProject)
+        self.labelProject.setVisible(False)
+
         self.labelNameImage = QLabel("")
         leftLayout.addWidget(self.labelNameImage)
 
@@ -60,6 +73,20 @@ class ImageViewer(QWidget):
         self.view = CustomGraphicsView(self.scene, self)
         leftLayout.addWidget(self.view)
 
+        # Frame selector for multi-page (z-stack or time-lapse) masks
+        self.frameWidget = QWidget()
+        frameLayout = QHBoxLayout()
+        frameLayout.setContentsMargins(0, 0, 0, 0)
+        self.frameWidget.setLayout(frameLayout)
+        self.frameLabel = QLabel("")
+        self.frameSlider = QSlider(Qt.Horizontal, self)
+        self.frameSlider.setTracking(False)
+        self.frameSlider.valueChanged.connect(self.showFrame)
+        frameLayout.addWidget(self.frameLabel)
+        frameLayout.addWidget(self.frameSlider)
+        leftLayout.addWidget(self.frameWidget)
+        self.frameWidget.setVisible(False)
+
         # Progress bar for loading and processing
         self.loadingProgressBar = QProgressBar(self)
         rightLayout.addWidget(self.loadingProgressBar)
@@ -74,14 +101,91 @@ class ImageViewer(QWidget):
         self.qaProgressBar.setValue(0)
         self.qaProgressBar.setFormat("%p%")
 
-        self.objectList = QListWidget(self)
-        rightLayout.addWidget(self.objectList)
-        self.objectList.itemClicked.connect(self.onItemClicked)
+        # Search the object list by label, pixel count, review state and note
+        searchLayout = QHBoxLayout()
+        self.searchId = QLineEdit(self)
+        self.searchId.setPlaceholderText("ID")
+        self.searchId.setFixedWidth(70)
+        self.searchMinPixels = QLineEdit(self)
+        self.searchMinPixels.setPlaceholderText("min px")
+        self.searchMinPixels.setFixedWidth(60)
+        self.searchMaxPixels = QLineEdit(self)
+        self.searchMaxPixels.setPlaceholderText("max px")
+        self.searchMaxPixels.setFixedWidth(60)
+        self.searchState = QComboBox(self)
+        self.searchState.addItem("All", None)
+        self.searchState.addItem("Unchecked", STATE_UNCHECKED)
+        self.searchState.addItem("Yes", STATE_YES)
+        self.searchState.addItem("No", STATE_NO)
+        self.searchNote = QLineEdit(self)
+        self.searchNote.setPlaceholderText("note")
+        for lineEdit in (self.searchId, self.searchMinPixels, self.searchMaxPixels, self.searchNote):
+            lineEdit.textChanged.connect(self.applyListOrder)
+        self.searchId.returnPressed.connect(self.showSearchedObject)
+        self.searchState.currentIndexChanged.connect(self.applyListOrder)
+        searchLayout.addWidget(QLabel("Search:", self))
+        searchLayout.addWidget(self.searchId)
+        searchLayout.addWidget(self.searchMinPixels)
+        searchLayout.addWidget(self.searchMaxPixels)
+        searchLayout.addWidget(self.searchState)
+        searchLayout.addWidget(self.searchNote)
+        rightLayout.addLayout(searchLayout)
+
+        # Sort and filter the object list by a per-object metric
+        sortLayout = QHBoxLayout()
+        self.sortCombo = QComboBox(self)
+        for metric, name in METRICS.items():
+            self.sortCombo.addItem(name, metric)
+        self.orderCombo = QComboBox(self)
+        self.orderCombo.addItems(["Ascending", "Descending"])
+        self.filterMin = QLineEdit(self)
+        self.filterMin.setPlaceholderText("min")
+        self.filterMin.setFixedWidth(60)
+        self.filterMax = QLineEdit(self)
+        self.filterMax.setPlaceholderText("max")
+        self.filterMax.setFixedWidth(60)
+        self.sortCombo.currentIndexChanged.connect(self.applyListOrder)
+        self.orderCombo.currentIndexChanged.connect(self.applyListOrder)
+        self.filterMin.editingFinished.connect(self.applyListOrder)
+        self.filterMax.editingFinished.connect(self.applyListOrder)
+        sortLayout.addWidget(QLabel("Sort by:", self))
+        sortLayout.addWidget(self.sortCombo)
+        sortLayout.addWidget(self.orderCombo)
+        sortLayout.addWidget(self.filterMin)
+        sortLayout.addWidget(self.filterMax)
+        rightLayout.addLayout(sortLayout)
+
+        self.objectModel = ObjectListModel(self)
+        self.objectList = QListView(self)
+        self.objectList.setModel(self.objectModel)
+        self.objectList.setUniformItemSizes(True)
+        self.objectList.clicked.connect(self.onItemClicked)
+
+        # Unlabelled blobs found in the background, reviewed like objects
+        self.candidateModel = CandidateListModel(self)
+        self.candidateList = QListView(self)
+        self.candidateList.setModel(self.candidateModel)
+        self.candidateList.setUniformItemSizes(True)
+        self.candidateList.clicked.connect(self.onCandidateClicked)
+
+        self.listTabs = QTabWidget(self)
+        self.listTabs.addTab(self.objectList, "Objects")
+        self.listTabs.addTab(self.candidateList, "Candidates")
+        rightLayout.addWidget(self.listTabs)
 
         self.btnLoad = QPushButton("Load Image", self)
         self.btnLoad.clicked.connect(self.loadImage)
         rightLayout.addWidget(self.btnLoad)
 
+        self.btnOpenProject = QPushButton("Open Project", self)
+        self.btnOpenProject.clicked.connect(self.openProject)
+        rightLayout.addWidget(self.btnOpenProject)
+
+        self.btnNextPair = QPushButton("Next Image", self)
+        self.btnNextPair.clicked.connect(self.nextPair)
+        rightLayout.addWidget(self.btnNextPair)
+        self.btnNextPair.setDisabled(True)
+
         self.btnNext = QPushButton("Next Object", self)
         self.btnNext.clicked.connect(self.nextObject)
         rightLayout.addWidget(self.btnNext)
@@ -117,6 +221,11 @@ class ImageViewer(QWidget):
         rightLayout.addWidget(self.toggleButton)
         self.toggleButton.setDisabled(True)
 
+        self.btnOutlines = QPushButton("Show/Hide Outlines", self)
+        self.btnOutlines.clicked.connect(self.toggleOutlines)
+        rightLayout.addWidget(self.btnOutlines)
+        self.btnOutlines.setDisabled(True)
+
         self.btnSaveInfo = QPushButton("Save Progress", self)
         self.btnSaveInfo.clicked.connect(self.saveInfo)
         rightLayout.addWidget(self.btnSaveInfo)
@@ -127,6 +236,13 @@ class ImageViewer(QWidget):
         rightLayout.addWidget(self.btnloadInfo)
         self.btnloadInfo.setDisabled(True)
 
+        # Only there when started with --profile
+        self.btnProfiler = QPushButton("Profiler", self)
+        self.btnProfiler.clicked.connect(self.showProfiler)
+        rightLayout.addWidget(self.btnProfiler)
+        self.btnProfiler.setVisible(isProfiling())
+        self.profilerPanel = None
+
         self.coordinateLabel = QLabel(self)
         font = QFont()
         font.setBold(True)
@@ -158,6 +274,7 @@ class ImageViewer(QWidget):
 
         self.setWindowTitle("Image and Mask Viewer")
         self.setGeometry(300, 300, 1200, 800)
+        self.setAcceptDrops(True)
 
         self.show()
 
@@ -165,35 +282,90 @@ class ImageViewer(QWidget):
         self.maskPath = ""
         self.currentObjectIndex = 0
         self.savedLabel = False
-        self.objects = []
-        self.objectState = {}
-
-        self.objectState["Object Number"] = []
-        self.objectState["Object State"] = []
-        self.objectState["Note"] = []
-        
-        self.noteNonLabel = []
+        self.pair = None
+        self.project = None
+        self.overlayPrefetcher = None
+        self.hoveredIndex = -1
+        self.candidateTable = None
+        self.candidateReview = None
+        self.currentCandidateIndex = -1
+        self.candidateJobs = []
+        self.loadJobs = []
+        self.candidatePending = False
 
     def loadImage(self):
-        self.imagePath, _ = QFileDialog.getOpenFileName(
+        imagePath, _ = QFileDialog.getOpenFileName(
             self, "Open file", "/home", "Image files (*.tiff *.tif)"
         )
-        if not self.imagePath:
+        if not imagePath:
             return
-        self.maskPath, _ = QFileDialog.getOpenFileName(
+        maskPath, _ = QFileDialog.getOpenFileName(
             self, "Open file", "/home", "Mask files (*.tiff *.tif)"
         )
-        if not self.maskPath:
+        if not maskPath:
             return
 
+        if self.project:
+            self.closeProject()
+        self.openPair(imagePath, maskPath)
+
+    def openPaths(self, paths):
+        # Paths from the command line or a drop: a project folder or manifest,
+        # or an image and its mask
+        if len(paths) == 1 and (os.path.isdir(paths[0]) or paths[0].lower().endswith(".csv")):
+            self.openProjectPath(paths[0])
+        elif len(paths) == 2 and all(path.lower().endswith(TIFF_EXTENSIONS) for path in paths):
+            if self.project:
+                self.closeProject()
+            self.openPair(*orderPair(paths))
+        else:
+            QMessageBox.warning(
+                self, "Warning", "Open a project folder, a manifest CSV or an image and its mask."
+            )
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls() and all(url.isLocalFile() for url in event.mimeData().urls()):
+            event.acceptProposedAction()
+
+    def dropEvent(self, event):
+        event.acceptProposedAction()
+        self.openPaths([url.toLocalFile() for url in event.mimeData().urls()])
+
+    def showProfiler(self):
+        from profiler_panel import ProfilerPanel
+        if self.profilerPanel is None:
+            self.profilerPanel = ProfilerPanel(self)
+        self.profilerPanel.show()
+        self.profilerPanel.raise_()
+
+    def warmUp(self):
+        # Import the analysis stack while the window waits for input, so the
+        # first image opens without that delay
+        for name in ANALYSIS_MODULES:
+            importlib.import_module(name)
+
+    @profiled()
+    def openPair(self, imagePath, maskPath, pair=None):
+        # pair is a LabelPair already prepared in the background, if any
+        from image_loader import releaseArrays
+        from label_core import LabelPair
+        self.imagePath = imagePath
+        self.maskPath = maskPath
+
         # Display the base image in the QGraphicsView
         try:
-            # Initialize the QGraphicsScene
-            self.basePixmap = QPixmap(self.imagePath)
-            self.baseItem = QGraphicsPixmapItem(self.basePixmap)
-            self.scene.addItem(self.baseItem)
-            self.scene.setSceneRect(self.baseItem.boundingRect())
-            self.view.fitInView(self.scene.sceneRect(), Qt.KeepAspectRatio)
+            self.resetScene()
+            keepPaths = [imagePath, maskPath]
+            if self.project:
+                keepPaths += self.project.pathsInUse()
+            releaseArrays(keepPaths)
+            # Nothing of the new pair may end up in the old pair's journal
+            self.closeJournal()
+            if self.pair:
+                self.pair.close()
+
+            self.pair = pair or LabelPair(imagePath, maskPath)
+            self.showBaseImage()
 
             # Initialize loading progress bar
             self.loadingProgressBar.setMaximum(100)
@@ -205,48 +377,173 @@ class ImageViewer(QWidget):
             self.qaProgressBar.setValue(0)
             self.qaProgressBar.setFormat("%p%")
 
+            self.hoveredIndex = -1
+            if pair is not None:
+                self.qaProgressBar.setMaximum(len(self.pair.objects))
+                self.loadingFinished()
+                return
+
             # Extract objects from the mask
-            self.extractObjects(self.maskPath)
+            self.extractObjects()
 
-            # Create and start the worker thread
-            self.thread = QThread()
-            self.worker = Worker(self.maskArray, self.objects)
-            self.worker.moveToThread(self.thread)
+            # Create and start the worker thread. Its pair is kept with it, so
+            # a loader still running for a pair that was left is ignored.
+            thread = QThread(self)
+            worker = Worker(self.pair)
+            worker.moveToThread(thread)
 
             # Connect signals and slots
-            self.thread.started.connect(self.worker.run)
-            self.worker.finished.connect(self.thread.quit)
-            self.worker.finished.connect(self.worker.deleteLater)
-            self.thread.finished.connect(self.thread.deleteLater)
-            self.worker.progress.connect(self.updateLoadingProgressBar)
-            self.thread.finished.connect(self.loadingFinished)
+            thread.started.connect(worker.run)
+            worker.finished.connect(thread.quit)
+            worker.finished.connect(worker.deleteLater)
+            thread.finished.connect(thread.deleteLater)
+            worker.progress.connect(self.updateLoadingProgressBar)
+            job = (thread, worker, self.pair)
+            thread.finished.connect(lambda: self.loaderFinished(job))
+            self.loadJobs.append(job)
 
             # Start the worker thread
-            self.thread.start()
+            thread.start()
 
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Failed to load image: {e}")
 
+    def loaderFinished(self, job):
+        self.loadJobs.remove(job)
+        if job[2] is self.pair:
+            self.loadingFinished()
+
+    def showBaseImage(self):
+        # Initialize the QGraphicsScene with a tiled, multi-resolution base image
+        from scene_items import TiledImageItem
+        self.baseItem = TiledImageItem(
+            self.pair.imagePyramid, self.pair.renderImage, smooth=True
+        )
+        self.scene.addItem(self.baseItem)
+        self.scene.setSceneRect(self.baseItem.boundingRect())
+        self.view.fitInView(self.scene.sceneRect(), Qt.KeepAspectRatio)
+
+    def showFrame(self, frame):
+        if self.pair is None or self.pair.objectTable is None or frame == self.pair.frame:
+            return
+        try:
+            self.pair.setFrame(frame)
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Failed to load frame {frame + 1}: {e}")
+            return
+        self.resetScene()
+        self.hoveredIndex = -1
+        self.showBaseImage()
+        self.qaProgressBar.setMaximum(len(self.pair.objects))
+        self.showObjects()
+        self.updateQAProgressBar()
+        self.maskVisible = True
+        self.updateFrameSelector()
+
+        self.detectCandidates()
+
+        # Decode and analyse the neighbouring frames while this one is reviewed
+        self.pair.prefetchFrames([frame + 1, frame - 1])
+
+    def updateFrameSelector(self):
+        frameCount = self.pair.frameCount
+        self.frameWidget.setVisible(frameCount > 1)
+        self.frameSlider.blockSignals(True)
+        self.frameSlider.setMaximum(frameCount - 1)
+        self.frameSlider.setValue(self.pair.frame)
+        self.frameSlider.blockSignals(False)
+        self.frameLabel.setText(f"Frame {self.pair.frame + 1} / {frameCount}")
+
+    def resetScene(self):
+        self.scene.clear()
+        for name in ("baseItem", "maskItem", "singleMaskItem", "hoverItem", "outlineItem", "mergeItem"):
+            if hasattr(self, name):
+                delattr(self, name)
+        self.view.boundingBox = None
+        self.currentObjectIndex = 0
+        self.candidateTable = None
+        self.candidateReview = None
+        self.currentCandidateIndex = -1
+        self.objectModel.clear()
+        self.candidateModel.clear()
+        self.listTabs.setTabText(1, "Candidates")
+        if self.overlayPrefetcher:
+            self.overlayPrefetcher.close()
+            self.overlayPrefetcher = None
+
+    def openProject(self):
+        path = QFileDialog.getExistingDirectory(self, "Open project", "/home")
+        if path:
+            self.openProjectPath(path)
+
+    def openProjectPath(self, path):
+        try:
+            project = Project.open(path)
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Failed to open project: {e}")
+            return
+        if not len(project):
+            QMessageBox.warning(self, "Warning", "No image/mask pairs found in this project.")
+            return
+
+        if self.project:
+            self.closeProject()
+        self.project = project
+        self.btnNextPair.setDisabled(False)
+        self.labelProject.setVisible(True)
+        self.nextPair()
+
+    def closeProject(self):
+        self.updateProjectStatus()
+        self.project.close()
+        self.project = None
+        self.btnNextPair.setDisabled(True)
+        self.labelProject.setVisible(False)
+
+    def nextPair(self):
+        index = self.project.nextIndex()
+        if index is None:
+            QMessageBox.information(self, "Project", "No other image in this project is left to review.")
+            return
+        self.openProjectPair(index)
+
+    def openProjectPair(self, index):
+        self.updateProjectStatus()
+        pair = self.project.takePair(index)
+        self.project.currentIndex = index
+        imagePath, maskPath = self.project.pairs[index]
+        self.openPair(imagePath, maskPath, pair)
+
+        if self.project.statusOf(index) != STATUS_DONE:
+            self.project.setStatus(index, STATUS_IN_PROGRESS)
+        self.labelProject.setText(f"Image {index + 1} / {len(self.project)}")
+
+        # Prepare the following pair while this one is reviewed
+        self.project.prefetch(self.project.nextIndex(index))
+
+    def updateProjectStatus(self):
+        if not self.project or self.project.currentIndex < 0 or self.pair is None:
+            return
+        if self.pair.objectTable is None:
+            return
+        checked, total, allFrames = self.pair.reviewTotals()
+        status = STATUS_DONE if allFrames and checked == total else STATUS_IN_PROGRESS
+        self.project.setStatus(self.project.currentIndex, status, checked, total)
+
     def updateQAProgressBar(self):
-        checked_count = len(self.objectState["Object State"])
+        checked_count = self.pair.reviewState.checkedCount()
         self.qaProgressBar.setValue(checked_count)
 
-        percentage = (checked_count / len(self.objects)) * 100
+        percentage = (checked_count / len(self.pair.objects)) * 100
         self.qaProgressBar.setFormat(f"{percentage:.2f}% Checked")
 
     def updateLoadingProgressBar(self, value):
         self.loadingProgressBar.setValue(value)
 
+    @profiled()
     def loadingFinished(self):
         self.loadingProgressBar.setVisible(False)
-
-        # Display the mask image in the QGraphicsView
-        self.maskPixmap = QPixmap("all_objects_with_low_opacity.tiff")
-        self.maskItem = QGraphicsPixmapItem(self.maskPixmap)
-        self.scene.addItem(self.maskItem)
-        self.maskItem.setOpacity(0.5)
-
-        self.populateObjectList()
+        self.showObjects()
 
         self.toggleButton.setDisabled(False)
         self.btnNext.setDisabled(False)
@@ -255,6 +552,7 @@ class ImageViewer(QWidget):
         self.btnNo.setDisabled(False)
         self.btnMerge.setDisabled(False)
         self.toggleButton.setDisabled(False)
+        self.btnOutlines.setDisabled(False)
         self.btnSaveInfo.setDisabled(False)
         self.btnloadInfo.setDisabled(False)
         self.btnNoForNonLabel.setDisabled(False)
@@ -264,7 +562,27 @@ class ImageViewer(QWidget):
         self.view.setMouseTracking(True)
         self.maskVisible = True
 
+        self.openJournal()
+        self.updateFrameSelector()
+        self.detectCandidates()
+        self.pair.prefetchFrames([self.pair.frame + 1, self.pair.frame - 1])
+
+    def showObjects(self):
+        # Display the mask overlay in the QGraphicsView, coloured tile by tile
+        from scene_items import TiledImageItem
+        self.maskItem = TiledImageItem(
+            self.pair.maskPyramid, self.pair.renderOverlay, smooth=False
+        )
+        self.scene.addItem(self.maskItem)
+        self.maskItem.setOpacity(self.transparencySlider.value() / 100)
+
+        self.populateObjectList()
+        self.overlayPrefetcher = OverlayPrefetcher(self.pair)
+
     def saveInfo(self):
+        from review_state import writeProgressCsv
+        if not self.reviewReady():
+            return
         default_file_name = "progress_" + os.path.splitext(os.path.basename(self.imagePath))[0] + ".csv"
         self.saveFilePath, _ = QFileDialog.getSaveFileName(
             None, "Save CSV", default_file_name, "CSV Files (*.csv);;All Files (*)"
@@ -272,32 +590,10 @@ class ImageViewer(QWidget):
 
         if self.saveFilePath:
             try:
-                with open(
-                    self.saveFilePath, mode="w", newline="", encoding="utf-8-sig"
-                ) as file:
-                    writer = csv.DictWriter(file, fieldnames=self.objectState.keys())
-                    writer.writeheader()
-                    rows = [
-                        dict(zip(self.objectState, t))
-                        for t in zip(*self.objectState.values())
-                    ]
-                    rows.append(
-                        {
-                            "Object Number": f"label_{self.objects[self.currentObjectIndex]}",
-                            "Object State": "Current index",
-                            "Note": "",
-                        }
-                    )
-                    for note in self.noteNonLabel:
-                        rows.append(
-                            {
-                                "Object Number": None,
-                                "Object State": None,
-                                "Note": note,  
-                            }
-                        )
-
-                    writer.writerows(rows)
+                with Span("ImageViewer.saveInfo"):
+                    rows = self.progressRows()
+                    writeProgressCsv(self.saveFilePath, rows)
+                    self.journal.compact(rows)
                 QMessageBox.information(None, "Success", "File saved successfully.")
                 self.savedLabel = True
             except Exception as e:
@@ -305,38 +601,22 @@ class ImageViewer(QWidget):
         else:
             QMessageBox.warning(None, "Warning", "Save operation cancelled.")
 
+    def progressRows(self):
+        return self.pair.progressRows(self.currentObjectIndex)
+
     def loadInfo(self):
+        from review_state import readProgressCsv
+        if not self.reviewReady():
+            return
         self.loadFilePath, _ = QFileDialog.getOpenFileName(
             self, "Open file", "/home", "CSV Files (*.csv);;All Files (*)"
         )
 
         if self.loadFilePath:
             try:
-                with open(self.loadFilePath, mode="r", encoding="utf-8-sig") as file:
-                    reader = csv.DictReader(file)
-                    rows = list(reader)
-
-                    index_to_split = None
-                    for i, row in enumerate(rows):
-                        if row["Object State"] == "Current index":
-                            index_to_split = i
-                            break
-                    
-                    currentItem = int(rows[index_to_split].get("Object Number", "").replace("label_", "").strip())
-                    self.selectObjectById(currentItem)
-
-                    haveLabel = rows[:index_to_split]
-
-                    self.colorListItems(haveLabel)
-                    self.loadObjectState(haveLabel)
-                    self.updateQAProgressBar()
-
-                    if index_to_split < len(rows):
-                        self.noteNonLabel.clear()
-                        nonLabel = rows[index_to_split + 1:]
-                        for row in nonLabel:
-                            self.noteNonLabel.append(row["Note"])
-
+                with Span("ImageViewer.loadInfo"):
+                    self.applyProgressRows(readProgressCsv(self.loadFilePath))
+                    self.journal.compact(self.progressRows())
                 QMessageBox.information(self, "Success", "File loaded successfully.")
                 self.savedLabel = True
             except Exception as e:
@@ -344,29 +624,16 @@ class ImageViewer(QWidget):
         else:
             QMessageBox.warning(None, "Warning", "Load operation cancelled.")
 
-    def loadObjectState(self, rows):
-        self.objectState = {
-            "Object Number": [],
-            "Object State": [],
-            "Note": []
-        }
-        for row in rows:
-            self.objectState["Object Number"].append(row["Object Number"])
-            self.objectState["Object State"].append(row["Object State"])
-            self.objectState["Note"].append(row["Note"])
-
-    def colorListItems(self, rows):
-        for row in rows:
-            numberObject = int(row["Object Number"].replace("label_", ""))
-            currentItem = self.objectList.findItems(
-                f"Object {(numberObject)}: {self.objectPixelCount[numberObject]} pixels",
-                Qt.MatchExactly,
-            )
-            if currentItem:
-                if row["Object State"] == "Yes":
-                    currentItem[0].setBackground(QColor("green"))
-                elif row["Object State"] == "No":
-                    currentItem[0].setBackground(QColor("Red"))
+    def applyProgressRows(self, rows):
+        frame, currentItem = self.pair.applyProgressRows(rows)
+        self.showFrame(frame)
+        self.objectModel.setReviewState(self.pair.reviewState)
+        self.applyListOrder()
+        if currentItem is not None:
+            self.selectObjectById(currentItem)
+        self.updateQAProgressBar()
+        if hasattr(self, "outlineItem"):
+            self.outlineItem.update()
 
     def getReason(self):
         dialog = QDialog(self)
@@ -402,33 +669,106 @@ class ImageViewer(QWidget):
         else:
             QTextEdit.keyPressEvent(textEdit, event)
 
-    def insertState(self, label, note):
-        object_number = self.objects[self.currentObjectIndex]
-        label_object_number = f"label_{object_number}"
-        if label_object_number in self.objectState["Object Number"]:
-            index = self.objectState["Object Number"].index(label_object_number)
-            self.objectState["Object State"][index] = label
-            self.objectState["Note"][index] = note
-        else:
-            self.objectState["Object Number"].append(label_object_number)
-            self.objectState["Object State"].append(label)
-            self.objectState["Note"].append(note)
+    def insertState(self, state, note):
+        self.pair.mark(self.currentObjectIndex, state, note)
+        self.recordAction(
+            {
+                "action": "mark",
+                "object": int(self.pair.objects[self.currentObjectIndex]),
+                "state": STATE_NAMES[state],
+                "note": note,
+            }
+        )
 
     def noForNonLabel(self):
+        if not self.reviewReady():
+            return
         reason = self.getReason()
-        self.noteNonLabel.append(reason)
+        self.pair.nonLabelNotes.append(reason)
+        self.recordAction({"action": "nonLabel", "note": reason})
+
+    def reviewReady(self):
+        # Marks are taken once the objects of a newly opened pair are shown
+        # and its own journal is open
+        return self.overlayPrefetcher is not None and hasattr(self, "journal")
+
+    def closeJournal(self):
+        if hasattr(self, "journal"):
+            self.journal.close()
+            del self.journal
+
+    def openJournal(self):
+        from journal import ProgressJournal
+        self.closeJournal()
+        self.journal = ProgressJournal(self.imagePath, self.maskPath)
+        if self.journal.hasSession():
+            try:
+                self.restoreSession()
+            except Exception as e:
+                QMessageBox.warning(self, "Warning", f"Failed to restore session: {e}")
+
+    def restoreSession(self):
+        rows, entries = self.journal.readSession()
+        if rows:
+            self.applyProgressRows(rows)
+        last = self.pair.applyJournalEntries(entries)
+        if last is not None:
+            frame, lastIndex = last
+            self.showFrame(frame)
+            self.objectModel.setReviewState(self.pair.reviewState)
+            self.applyListOrder()
+            self.selectObjectById(self.pair.objects[lastIndex])
+            self.updateQAProgressBar()
+        self.journal.compact(self.progressRows())
+        self.savedLabel = True
+
+    def recordAction(self, entry):
+        if self.pair.frameCount > 1:
+            entry["frame"] = self.pair.frame
+        if self.journal.append(entry):
+            self.journal.compact(self.progressRows())
+        self.checkJournal()
+
+    def checkJournal(self):
+        # Once autosave has failed, progress is only kept by Save Progress
+        error = self.journal.takeError() if hasattr(self, "journal") else None
+        if error is not None:
+            self.savedLabel = False
+            QMessageBox.warning(
+                self,
+                "Warning",
+                f"Autosave stopped: {error}\nUse Save Progress to keep your work.",
+            )
 
     def markObjectYes(self):
+        if not self.reviewReady():
+            return
+        if self.reviewingCandidates():
+            self.markCandidate(STATE_YES)
+            return
+        if not len(self.pair.objects):
+            return
         reason = ""
-        self.insertState("Yes", reason)
-        self.updateObjectListColor(self.currentObjectIndex, "green")
+        self.insertState(STATE_YES, reason)
+        self.updateObjectListState(self.currentObjectIndex)
         self.updateQAProgressBar()
+        if self.pair.reviewState.checkedCount() == len(self.pair.objects):
+            self.updateProjectStatus()
 
     def markObjectNo(self):
+        if not self.reviewReady():
+            return
+        if self.reviewingCandidates():
+            self.markCandidate(STATE_NO)
+            return
+        if not len(self.pair.objects):
+            return
         reason = self.getReason()
-        self.insertState("No", reason)
-        self.updateObjectListColor(self.currentObjectIndex, "red")
+        self.insertState(STATE_NO, reason)
+        self.updateObjectListState(self.currentObjectIndex)
         self.updateQAProgressBar()
+        if self.pair.reviewState.checkedCount() == len(self.pair.objects):
+            self.updateProjectStatus()
 
     def resizeEvent(self, event):
         if self.scene.items():
@@ -436,76 +776,118 @@ class ImageViewer(QWidget):
         super().resizeEvent(event)
 
     def toggleMask(self):
+        # Also leaves the merge view, as the overlay would be hidden under it
+        self.hideMerge()
         if self.maskVisible:
             if hasattr(self, "singleMaskItem"):
                 self.singleMaskItem.hide()
             if hasattr(self, "maskItem"):
                 self.maskItem.hide()
+            if hasattr(self, "hoverItem"):
+                self.hoverItem.hide()
         else:
             if hasattr(self, "singleMaskItem"):
                 self.singleMaskItem.show()
             elif hasattr(self, "maskItem"):
                 self.maskItem.show()
+            if hasattr(self, "hoverItem"):
+                self.hoverItem.show()
         self.maskVisible = not self.maskVisible
 
-    def extractObjects(self, maskPath):
-        maskImage = Image.open(maskPath)
-        self.maskArray = np.array(maskImage)
-        uniqueObjects = np.unique(self.maskArray)
-        self.objects = uniqueObjects
-        self.objects = self.objects[1:]
-        self.objectPixelCount = {obj: np.sum(self.maskArray == obj) for obj in self.objects}
-        self.qaProgressBar.setMaximum(len(self.objects))
-
-    def populateObjectList(self):
-        self.objectList.clear()
-        for obj in self.objects:
-            pixel_count = self.objectPixelCount[obj]
-            item = QListWidgetItem(f"Object {int(obj)}: {pixel_count} pixels")
-            self.objectList.addItem(item)
+    def toggleOutlines(self):
+        from scene_items import ContourItem
+        if self.pair is None or self.pair.objectTable is None:
+            return
+        if not hasattr(self, "outlineItem"):
+            self.outlineItem = ContourItem(
+                self.pair.buildContours(),
+                self.pair.objectTable.bboxes,
+                self.pair.maskArray.shape,
+                self.outlineColor,
+            )
+            self.outlineItem.setZValue(2)
+            self.scene.addItem(self.outlineItem)
+        else:
+            self.outlineItem.setVisible(not self.outlineItem.isVisible())
 
-    def mergeMaskAndImage(self):
-        maskClone = np.where(self.maskArray != 0, 1, 0)
-        img = Image.open(self.imagePath)
-        imgArray = np.array(img)
+    def outlineColor(self, index):
+        # Reviewed objects take their list colour, the others their mask colour
+        color = ObjectListModel.stateColors.get(int(self.pair.reviewState.states[index]))
+        if color is None:
+            color = QColor(*self.pair.palette[index + 1].tolist())
+        return color
 
-        if len(imgArray.shape) == 3:
-            for c in range(3):
-                imgArray[:, :, c][maskClone == 1] = 0
-        else:
-            imgArray[maskClone == 1] = 0
-        modifiedImage = Image.fromarray(imgArray)
-        modifiedImage.save("output_image.tiff")
+    def extractObjects(self):
+        self.pair.extractObjects()
+        self.qaProgressBar.setMaximum(len(self.pair.objects))
 
-        if hasattr(self, "maskItem"):
-            self.scene.removeItem(self.maskItem)
-            del self.maskItem
+    def populateObjectList(self):
+        self.objectModel.setObjectTable(self.pair.objectTable, self.pair.reviewState)
+        self.applyListOrder()
 
-        self.maskPixmap = QPixmap("output_image.tiff")
-        self.maskItem = QGraphicsPixmapItem(self.maskPixmap)
-        self.scene.addItem(self.maskItem)
-        self.transparencySlider.setValue(100)
-        self.maskVisible = True
-        self.view.fitInView(self.scene.sceneRect(), Qt.KeepAspectRatio)
+    def applyListOrder(self):
+        if self.pair is None or self.pair.objectTable is None:
+            return
+        keep = self.pair.objectTable.select(
+            obj_id=self.filterBound(self.searchId),
+            minPixels=self.filterBound(self.searchMinPixels),
+            maxPixels=self.filterBound(self.searchMaxPixels),
+        )
+        keep &= self.pair.reviewState.select(
+            state=self.searchState.currentData(), noteText=self.searchNote.text().strip()
+        )
+        metric = self.sortCombo.currentData()
+        order = self.pair.objectTable.orderBy(
+            metric,
+            descending=self.orderCombo.currentIndex() == 1,
+            low=self.filterBound(self.filterMin),
+            high=self.filterBound(self.filterMax),
+            keep=keep,
+        )
+        self.objectModel.setOrder(order, metric)
+        row = self.objectModel.rowOf(self.currentObjectIndex)
+        if row >= 0:
+            self.setCurrentRow(row)
 
-    def changeMask(self):
-        # Get the current object
-        current_object = self.objects[self.currentObjectIndex]
+    def showSearchedObject(self):
+        obj_id = self.filterBound(self.searchId)
+        if obj_id is not None and obj_id == int(obj_id):
+            self.selectObjectById(int(obj_id))
 
-        # Create a mask clone for the current object
-        maskClone = np.where(self.maskArray == current_object, current_object, 0)
+    def filterBound(self, lineEdit):
+        try:
+            return float(lineEdit.text())
+        except ValueError:
+            return None
 
-        # Create an RGBA image with the same size as the mask
-        outputImage = np.zeros((maskClone.shape[0], maskClone.shape[1], 4), dtype=np.uint8)
+    def mergeMaskAndImage(self):
+        # Image with labelled pixels blacked out drawn over the mask, built once
+        # per pair and toggled by the Merge button. Timed with a Span, as a
+        # decorator would also be handed the button's checked argument.
+        from scene_items import TiledImageItem
+        with Span("ImageViewer.mergeMaskAndImage"):
+            if hasattr(self, "mergeItem"):
+                self.mergeItem.setVisible(not self.mergeItem.isVisible())
+            else:
+                self.mergeItem = TiledImageItem(self.pair.buildMergePyramid(), lambda tile: tile)
+                self.mergeItem.setZValue(0.5)
+                self.scene.addItem(self.mergeItem)
+            if self.mergeItem.isVisible():
+                self.view.fitInView(self.scene.sceneRect(), Qt.KeepAspectRatio)
 
-        # Set the color of the current object
-        color = self.worker.objectColors[current_object]
-        outputImage[maskClone != 0] = [*color, 255]  # Set RGBA with full opacity
+    def hideMerge(self):
+        if hasattr(self, "mergeItem"):
+            self.mergeItem.hide()
 
-        # Create an image from the mask array
-        img = Image.fromarray(outputImage, "RGBA")
-        img.save("output_image.tiff", compression="tiff_lzw")
-        self.imageMaskClone = img
+    @profiled()
+    def changeMask(self):
+        # Render the current object within its bounding box only, full opacity.
+        # Nothing to show until the objects of a newly opened pair are loaded.
+        from qt_image import arrayToQImage
+        if self.overlayPrefetcher is None:
+            return
+        self.hideMerge()
+        patch, bbox = self.overlayPrefetcher.crop(self.currentObjectIndex)
 
         # Remove existing mask items if present
         if hasattr(self, "maskItem"):
@@ -515,29 +897,53 @@ class ImageViewer(QWidget):
             self.scene.removeItem(self.singleMaskItem)
             del self.singleMaskItem
 
-        # Display the new mask image
-        self.singleMaskPixmap = QPixmap("output_image.tiff")
+        # Display the new mask patch at the object's offset
+        self.singleMaskPixmap = QPixmap.fromImage(arrayToQImage(patch))
         self.singleMaskItem = QGraphicsPixmapItem(self.singleMaskPixmap)
+        self.singleMaskItem.setOffset(bbox[1], bbox[0])
         self.scene.addItem(self.singleMaskItem)
         self.singleMaskItem.setOpacity(self.transparencySlider.value() / 100)
         self.maskVisible = True
 
         # Scale to the object
-        self.scaleToObject(maskClone)
+        self.scaleToObject(self.currentObjectIndex)
+
+        # Render the neighbours in list order while the reviewer looks at this one
+        self.overlayPrefetcher.prefetch(self.neighborIndices(PREFETCH_RADIUS))
+
+    def neighborIndices(self, radius):
+        # Nearest objects in list order first, alternating forward and backward
+        indices = []
+        row = self.objectModel.rowOf(self.currentObjectIndex)
+        if row < 0:
+            return indices
+        for step in range(1, radius + 1):
+            for neighbor in (row + step, row - step):
+                if 0 <= neighbor < self.objectModel.rowCount():
+                    indices.append(self.objectModel.indexAt(neighbor))
+        return indices
 
     def previousObject(self):
-        if self.currentObjectIndex > 0:
-            self.currentObjectIndex -= 1
-        self.objectList.setCurrentRow(self.currentObjectIndex)
-        self.changeMask()
-        self.view.drawBoundingBox(self.objects[self.currentObjectIndex])
+        if self.reviewingCandidates():
+            self.stepCandidate(-1)
+        else:
+            self.stepObject(-1)
 
     def nextObject(self):
-        if self.currentObjectIndex < len(self.objects) - 1:
-            self.currentObjectIndex += 1
-        self.objectList.setCurrentRow(self.currentObjectIndex)
-        self.changeMask()
-        self.view.drawBoundingBox(self.objects[self.currentObjectIndex])
+        if self.reviewingCandidates():
+            self.stepCandidate(1)
+        else:
+            self.stepObject(1)
+
+    def stepObject(self, step):
+        # Move through the list in its current sort order
+        rowCount = self.objectModel.rowCount()
+        if not rowCount:
+            return
+        row = self.objectModel.rowOf(self.currentObjectIndex)
+        row = 0 if row < 0 else min(max(row + step, 0), rowCount - 1)
+        self.setCurrentRow(row)
+        self.showObject(self.objectModel.indexAt(row))
 
     def updateOpacityValue(self, value):
         self.opacityValue.setText(str(value))
@@ -549,12 +955,10 @@ class ImageViewer(QWidget):
         if hasattr(self, "singleMaskItem"):
             self.singleMaskItem.setOpacity(opacity)
 
-    def scaleToObject(self, maskClone):
-        indices = np.where(maskClone != 0)
-        if len(indices[0]) == 0 or len(indices[1]) == 0:
-            return
-        minRow, maxRow = indices[0].min(), indices[0].max()
-        minCol, maxCol = indices[1].min(), indices[1].max()
+    def scaleToObject(self, index, table=None):
+        if table is None:
+            table = self.pair.objectTable
+        minRow, minCol, maxRow, maxCol = table.bbox(index)
         boundingRect = QRectF((minCol), minRow, (maxCol - minCol), (maxRow - minRow))
         self.view.fitInView(boundingRect, Qt.KeepAspectRatio)
         self.view.scale(1 / 4, 1 / 4)
@@ -563,60 +967,145 @@ class ImageViewer(QWidget):
         pointY = (minRow + maxRow) / 2
         self.coordinateLabel.setText(f"{int(pointX)}, {int(pointY)}")
 
-    def updateObjectListColor(self, index, color):
-        item = self.objectList.item(index)
+    def updateObjectListState(self, index):
         self.savedLabel = False
-        if item:
-            item.setBackground(QColor(color))
+        if self.searchState.currentData() is not None:
+            # The object may no longer match the state filter
+            self.applyListOrder()
+        else:
+            row = self.objectModel.rowOf(index)
+            self.objectModel.refreshRows(row, row)
+        if hasattr(self, "outlineItem"):
+            self.outlineItem.update()
+
+    def setCurrentRow(self, row):
+        self.objectList.setCurrentIndex(self.objectModel.index(row))
 
     def selectObjectById(self, obj_id):
-        if obj_id in self.objects:
-            index = self.objects.tolist().index(obj_id)
-            self.objectList.setCurrentRow(index)
-            self.onItemClicked(self.objectList.item(index))
-            self.view.drawBoundingBox(obj_id)
-
-    def onItemClicked(self, item):
-        index = self.objectList.row(item)
+        index = self.pair.objectTable.indexOf(obj_id)
+        if index >= 0:
+            row = self.objectModel.rowOf(index)
+            if row >= 0:
+                self.setCurrentRow(row)
+            else:
+                self.objectList.clearSelection()
+            self.showObject(index)
+
+    def onItemClicked(self, modelIndex):
+        self.showObject(self.objectModel.indexAt(modelIndex.row()))
+
+    def showObject(self, index):
         self.currentObjectIndex = index
         self.changeMask()
-        self.view.drawBoundingBox(self.objects[index])
+        self.view.drawBoundingBox(index)
+
+    def detectCandidates(self):
+        # Only one detection runs at a time. A request made meanwhile is
+        # served for the pair and frame shown once the running one finishes.
+        self.listTabs.setTabText(1, "Candidates (...)")
+        if self.candidateJobs:
+            self.candidatePending = True
+            return
+        thread = QThread(self)
+        worker = CandidateWorker(self.pair)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.finished.connect(thread.quit)
+        worker.finished.connect(self.candidatesFound)
+        thread.finished.connect(thread.deleteLater)
+        self.candidateJobs.append((thread, worker))
+        thread.start()
+
+    def candidatesFound(self, result):
+        from review_state import ReviewState
+        worker = self.sender()
+        self.candidateJobs = [job for job in self.candidateJobs if job[1] is not worker]
+        if self.candidatePending and self.pair is not None:
+            self.candidatePending = False
+            self.detectCandidates()
+        pair, frame, table = result
+        # Results for a pair or frame that is no longer shown are dropped
+        if pair is not self.pair or frame != pair.frame:
+            return
+        if table is None:
+            self.listTabs.setTabText(1, "Candidates (failed)")
+            return
+        self.candidateTable = table
+        self.candidateReview = ReviewState(len(table))
+        self.candidateModel.setObjectTable(table, self.candidateReview)
+        self.listTabs.setTabText(1, f"Candidates ({len(table)})")
+
+    def reviewingCandidates(self):
+        return self.listTabs.currentWidget() is self.candidateList
+
+    def onCandidateClicked(self, modelIndex):
+        self.showCandidate(modelIndex.row())
+
+    def stepCandidate(self, step):
+        if not self.candidateModel.rowCount():
+            return
+        row = self.currentCandidateIndex + step if self.currentCandidateIndex >= 0 else 0
+        row = min(max(row, 0), self.candidateModel.rowCount() - 1)
+        self.candidateList.setCurrentIndex(self.candidateModel.index(row))
+        self.showCandidate(row)
+
+    def showCandidate(self, index):
+        self.currentCandidateIndex = index
+        self.scaleToObject(index, self.candidateTable)
+        self.view.drawBoundingBox(index, self.candidateTable)
+
+    def markCandidate(self, state):
+        # A rejected candidate is a missing label, recorded like "No for non-label"
+        index = self.currentCandidateIndex
+        if index < 0:
+            return
+        note = ""
+        if state == STATE_NO:
+            note = self.getReason()
+            self.pair.nonLabelNotes.append(note)
+            self.recordAction({"action": "nonLabel", "note": note})
+            self.savedLabel = False
+        self.candidateReview.mark(index, state, note)
+        self.candidateModel.refreshRows(index, index)
 
     def highlightObjectAtPoint(self, point):
         x, y = int(point.x()), int(point.y())
         if (
             x >= 0
             and y >= 0
-            and x < self.maskArray.shape[1]
-            and y < self.maskArray.shape[0]
+            and x < self.pair.maskArray.shape[1]
+            and y < self.pair.maskArray.shape[0]
             and self.maskVisible
         ):
-            obj = self.maskArray[y, x]
+            obj = self.pair.maskArray[y, x]
             if obj != 0:
                 self.highlightSingleObject(obj)
 
+    @profiled()
     def highlightSingleObject(self, obj):
-        # Create a copy of the original mask image with low opacity
-        highlightedMaskArray = self.worker.maskImageArray.copy()
-
-        # Increase the opacity of the hovered object
-        mask_indices = self.maskArray == obj
-        highlightedMaskArray[mask_indices, 3] = 255  # Set alpha channel to max
-
-        # Create an image from the updated mask array
-        highlightedMaskImage = Image.fromarray(highlightedMaskArray, "RGBA")
-        highlightedMaskImage.save("highlighted_single_object.tiff", compression="tiff_lzw")
+        # Only repaint when the cursor moves onto a different object, and only
+        # once the objects of the current pair are loaded
+        from qt_image import arrayToQImage
+        if self.overlayPrefetcher is None:
+            return
+        index = self.pair.objectTable.indexOf(obj)
+        if index < 0 or index == self.hoveredIndex:
+            return
+        self.hoveredIndex = index
 
-        if hasattr(self, "singleMaskItem"):
-            self.scene.removeItem(self.singleMaskItem)
-            del self.singleMaskItem
+        if hasattr(self, "hoverItem"):
+            self.scene.removeItem(self.hoverItem)
+            del self.hoverItem
 
-        self.singleMaskPixmap = QPixmap("highlighted_single_object.tiff")
-        self.singleMaskItem = QGraphicsPixmapItem(self.singleMaskPixmap)
-        self.scene.addItem(self.singleMaskItem)
-        self.singleMaskItem.setOpacity(1.0)
+        # Render the hovered object at full opacity within its bounding box only
+        patch, bbox = self.overlayPrefetcher.crop(index)
+        self.hoverItem = QGraphicsPixmapItem(QPixmap.fromImage(arrayToQImage(patch)))
+        self.hoverItem.setOffset(bbox[1], bbox[0])
+        self.hoverItem.setZValue(1)
+        self.scene.addItem(self.hoverItem)
 
     def closeEvent(self, event):
+        self.checkJournal()
         if not self.savedLabel:
             reply = QMessageBox.question(
                 self,
@@ -632,3 +1121,16 @@ class ImageViewer(QWidget):
                 event.ignore()
         else:
             event.accept()
+
+        if event.isAccepted() and hasattr(self, "journal"):
+            self.journal.compact(self.progressRows())
+            self.journal.close()
+        if event.isAccepted() and self.project:
+            self.closeProject()
+        if event.isAccepted() and self.pair:
+            self.pair.close()
+        if event.isAccepted():
+            self.candidatePending = False
+            for thread, *_ in self.candidateJobs + self.loadJobs:
+                thread.quit()
+                thread.wait()
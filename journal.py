@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+from review_state import writeProgressCsv, readProgressCsv
+
+JOURNAL_DIR = os.path.join(os.path.expanduser("~"), ".label_checker", "journal")
+COMPACT_EVERY = 200
+
+
+def journalBasePath(imagePath, maskPath):
+    pair = f"{os.path.abspath(imagePath)}|{os.path.abspath(maskPath)}"
+    key = hashlib.sha1(pair.encode("utf-8")).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(imagePath))[0]
+    return os.path.join(JOURNAL_DIR, f"{stem}_{key}")
+
+
+class ProgressJournal:
+    # Per image/mask pair autosave: actions are appended to a JSON lines journal
+    # by a background thread and periodically compacted into a progress CSV
+    # snapshot with the same layout as "Save Progress".
+
+    def __init__(self, imagePath, maskPath):
+        basePath = journalBasePath(imagePath, maskPath)
+        self.journalPath = basePath + ".journal"
+        self.snapshotPath = basePath + ".csv"
+        self.pendingCount = 0
+        self.error = None
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def hasSession(self):
+        return os.path.exists(self.snapshotPath) or (
+            os.path.exists(self.journalPath) and os.path.getsize(self.journalPath) > 0
+        )
+
+    def readSession(self):
+        rows = readProgressCsv(self.snapshotPath) if os.path.exists(self.snapshotPath) else []
+        entries = []
+        if os.path.exists(self.journalPath):
+            with open(self.journalPath, mode="r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        # A crash can leave the last line half written
+                        break
+        return rows, entries
+
+    def append(self, entry):
+        self.queue.put(("append", entry))
+        self.pendingCount += 1
+        return self.pendingCount >= COMPACT_EVERY
+
+    def takeError(self):
+        # The write error that stopped the writer thread, returned only once
+        error, self.error = self.error, None
+        return error
+
+    def compact(self, rows):
+        self.queue.put(("compact", rows))
+        self.pendingCount = 0
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def _run(self):
+        try:
+            os.makedirs(JOURNAL_DIR, exist_ok=True)
+            with open(self.journalPath, mode="a", encoding="utf-8") as file:
+                while True:
+                    item = self.queue.get()
+                    if item is None:
+                        break
+                    action, payload = item
+                    if action == "append":
+                        file.write(json.dumps(payload) + "\n")
+                        file.flush()
+                    else:
+                        temporaryPath = self.snapshotPath + ".tmp"
+                        writeProgressCsv(temporaryPath, payload)
+                        os.replace(temporaryPath, self.snapshotPath)
+                        file.seek(0)
+                        file.truncate()
+        except OSError as e:
+            self.error = e
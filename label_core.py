@@ -0,0 +1,335 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from candidates import detectCandidates
+from contours import ObjectContours
+from image_loader import loadArray, frameCount
+from lru_cache import LRUCache
+from mask_cache import deriveMaskData
+from overlay import buildLut, colorizeMask, renderObjectCrop, displayScale, toDisplay8
+from pyramid import ImagePyramid
+from review_state import (
+    ReviewState,
+    STATE_UNCHECKED,
+    STATE_VALUES,
+    FRAME_FIELD,
+    writeProgressCsv,
+    readProgressCsv,
+)
+
+# Arrays and pyramids of recently shown frames kept in memory
+FRAME_CACHE_BYTES = 1024 * 1024 * 1024
+
+# Largest pyramid level used to choose the candidate threshold
+CANDIDATE_SAMPLE_PIXELS = 1 << 20
+
+
+def pageBytes(page):
+    # Decoded base array plus roughly a third more for its downsampled levels
+    array = page[0]
+    return (0 if isinstance(array, np.memmap) else array.nbytes) + array.nbytes // 3
+
+
+class LabelPair:
+    # An image/mask pair and everything derived from it: object table, palette,
+    # display pyramids and review progress. Nothing here needs Qt, so the same
+    # code backs the viewer, scripts and batch jobs.
+    # Multi-page masks hold one label plane per frame. Pages are decoded when a
+    # frame is first shown or prefetched, object tables are kept per frame and
+    # review state is keyed by (frame, label). The attributes below always
+    # describe the current frame.
+
+    def __init__(self, imagePath, maskPath):
+        self.imagePath = imagePath
+        self.maskPath = maskPath
+        self.frameCount = frameCount(maskPath)
+        self.imageFrameCount = frameCount(imagePath)
+        self.pages = LRUCache(FRAME_CACHE_BYTES, pageBytes)
+        self.frameData = {}
+        self.frameFutures = {}
+        self.frameLock = threading.Lock()
+        self.executor = None
+        self.reviewStates = {}
+        self.frameNotes = {}
+        self.objectTable = None
+        self.frame = 0
+        self.showFrameArrays(0)
+
+    def showFrameArrays(self, frame):
+        self.frame = frame
+        self.imageArray, self.maskArray, self.imagePyramid, self.maskPyramid = (
+            self.loadFrame(frame)
+        )
+        self.imageScale = displayScale(self.imageArray.dtype)
+        self.contours = None
+        self.mergePyramid = None
+
+    def loadPage(self, path, frame, smooth):
+        key = (path, frame)
+        with self.frameLock:
+            page = self.pages.get(key)
+        if page is None:
+            array = loadArray(path, frame)
+            page = (array, ImagePyramid(array, smooth=smooth))
+            with self.frameLock:
+                self.pages.put(key, page)
+        return page
+
+    def loadFrame(self, frame):
+        # Image, mask and their pyramids for one frame. A single-page image is
+        # shared by every frame of the mask.
+        imageArray, imagePyramid = self.loadPage(
+            self.imagePath, min(frame, self.imageFrameCount - 1), True
+        )
+        maskArray, maskPyramid = self.loadPage(self.maskPath, frame, False)
+        return imageArray, maskArray, imagePyramid, maskPyramid
+
+    def deriveFrame(self, frame):
+        # Object table and palette of one frame, computed once
+        with self.frameLock:
+            data = self.frameData.get(frame)
+        if data is None:
+            data = deriveMaskData(self.loadFrame(frame)[1])
+            with self.frameLock:
+                self.frameData[frame] = data
+        return data
+
+    def prepareFrame(self, frame):
+        self.deriveFrame(frame)
+        imagePyramid, maskPyramid = self.loadFrame(frame)[2:]
+        for pyramid in (maskPyramid, imagePyramid):
+            pyramid.level(pyramid.levelCount - 1)
+
+    def prefetchFrames(self, frames):
+        # Decode and analyse frames the reviewer is likely to show next
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        for frame in frames:
+            if 0 <= frame < self.frameCount and frame not in self.frameData and frame not in self.frameFutures:
+                self.frameFutures[frame] = self.executor.submit(self.prepareFrame, frame)
+
+    def setFrame(self, frame):
+        future = self.frameFutures.pop(frame, None)
+        if future is not None:
+            try:
+                future.result()
+            except Exception:
+                # Whatever failed in the background is retried and reported here
+                pass
+        self.showFrameArrays(frame)
+        if self.objectTable is not None:
+            self.extractObjects()
+
+    def close(self):
+        for future in self.frameFutures.values():
+            future.cancel()
+        self.frameFutures.clear()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+    def extractObjects(self):
+        self.objectTable, self.palette = self.deriveFrame(self.frame)
+        self.overlayLut = buildLut(self.palette, 128)  # RGBA with low opacity
+        self.reviewState = self.reviewStateOf(self.frame)
+        self.contours = None
+        self.mergePyramid = None
+
+    def reviewStateOf(self, frame):
+        state = self.reviewStates.get(frame)
+        if state is None:
+            state = self.reviewStates[frame] = ReviewState(len(self.deriveFrame(frame)[0]))
+        return state
+
+    @property
+    def nonLabelNotes(self):
+        return self.frameNotes.setdefault(self.frame, [])
+
+    def reviewTotals(self):
+        # Checked and total objects over the frames analysed so far, and
+        # whether those are all the frames
+        states = list(self.reviewStates.values())
+        checked = sum(state.checkedCount() for state in states)
+        total = sum(len(state) for state in states)
+        return checked, total, len(states) == self.frameCount
+
+    @property
+    def objects(self):
+        return self.objectTable.ids
+
+    def buildPyramids(self):
+        # Build every downsampled level, yielding the percentage done
+        steps = [
+            (pyramid, level)
+            for pyramid in (self.maskPyramid, self.imagePyramid)
+            for level in range(1, pyramid.levelCount)
+        ]
+        for i, (pyramid, level) in enumerate(steps):
+            pyramid.level(level)
+            yield int((i + 1) / len(steps) * 100)
+
+    def buildContours(self):
+        # Outlines are only needed once outline mode is switched on
+        if self.contours is None:
+            self.contours = ObjectContours.fromMask(self.maskArray, self.objectTable)
+        return self.contours
+
+    def detectCandidates(self):
+        # Unlabelled foreground blobs of the current frame, as an ObjectTable
+        level = 0
+        while (
+            level < self.imagePyramid.levelCount - 1
+            and self.imagePyramid.level(level).size > CANDIDATE_SAMPLE_PIXELS
+        ):
+            level += 1
+        return detectCandidates(
+            self.imageArray,
+            self.maskArray,
+            self.imagePyramid.level(level),
+            self.maskPyramid.level(level),
+        )
+
+    def renderImage(self, tile):
+        return toDisplay8(tile, self.imageScale)
+
+    def renderOverlay(self, tile):
+        return colorizeMask(tile, self.objectTable.labelIndex, self.overlayLut)
+
+    def renderObjectCrop(self, index, alpha=255):
+        obj = self.objects[index]
+        bbox = self.objectTable.bbox(index)
+        patch = renderObjectCrop(self.maskArray, bbox, obj, self.palette[index + 1], alpha)
+        return patch, bbox
+
+    def renderMerge(self, level=0):
+        # Display image with every labelled pixel blacked out
+        imageLevel = self.imagePyramid.level(level)
+        merged = toDisplay8(imageLevel, self.imageScale)
+        if merged is imageLevel:
+            merged = merged.copy()
+        merged[self.maskPyramid.level(level) != 0] = 0
+        return merged
+
+    def buildMergePyramid(self):
+        # Every level comes from the matching image and mask levels, so nothing
+        # is downsampled a second time
+        if self.mergePyramid is None:
+            pyramid = ImagePyramid(self.renderMerge(), smooth=True)
+            pyramid.levels += [self.renderMerge(level) for level in range(1, pyramid.levelCount)]
+            self.mergePyramid = pyramid
+        return self.mergePyramid
+
+    def mark(self, index, state, note=""):
+        self.reviewState.mark(index, state, note)
+
+    def withFrame(self, frame, rows):
+        # Multi-frame masks get a leading Frame column on every row
+        if self.frameCount == 1:
+            return rows
+        return [{FRAME_FIELD: frame, **row} for row in rows]
+
+    @staticmethod
+    def rowFrame(row):
+        return int(row.get(FRAME_FIELD) or 0)
+
+    def progressRows(self, currentIndex):
+        rows = []
+        for frame in sorted(self.reviewStates):
+            ids = self.deriveFrame(frame)[0].ids
+            rows += self.withFrame(frame, self.reviewStates[frame].progressRows(ids))
+        # A frame without objects has no current one
+        if 0 <= currentIndex < len(self.objects):
+            rows += self.withFrame(
+                self.frame,
+                [
+                    {
+                        "Object Number": f"label_{self.objects[currentIndex]}",
+                        "Object State": "Current index",
+                        "Note": "",
+                    }
+                ],
+            )
+        for frame in sorted(self.frameNotes):
+            rows += self.withFrame(
+                frame,
+                [
+                    {
+                        "Object Number": None,
+                        "Object State": None,
+                        "Note": note,
+                    }
+                    for note in self.frameNotes[frame]
+                ],
+            )
+        return rows
+
+    def applyProgressRows(self, rows):
+        # Replace the review state with the rows of a progress file and return
+        # the frame and label that were current when it was saved. Files saved
+        # without a current object return label None; their object rows end
+        # where the note rows start.
+        index_to_split = None
+        for i, row in enumerate(rows):
+            if row["Object State"] == "Current index":
+                index_to_split = i
+                break
+
+        if index_to_split is None:
+            index_to_split = next(
+                (i for i, row in enumerate(rows) if not row.get("Object Number")), len(rows)
+            )
+            currentFrame, currentItem = self.frame, None
+            notesStart = index_to_split
+        else:
+            currentFrame = self.rowFrame(rows[index_to_split])
+            currentItem = int(rows[index_to_split].get("Object Number", "").replace("label_", "").strip())
+            notesStart = index_to_split + 1
+
+        haveLabel = rows[:index_to_split]
+        frames = np.array([self.rowFrame(row) for row in haveLabel], dtype=np.int64)
+        numbers = np.array(
+            [int(row["Object Number"].replace("label_", "")) for row in haveLabel], dtype=np.int64
+        )
+        states = np.array(
+            [STATE_VALUES.get(row["Object State"], STATE_UNCHECKED) for row in haveLabel],
+            dtype=np.uint8,
+        )
+        notes = [row["Note"] for row in haveLabel]
+        for state in self.reviewStates.values():
+            state.clear()
+        for frame in np.unique(frames).tolist():
+            if not 0 <= frame < self.frameCount:
+                continue
+            frameRows = np.flatnonzero(frames == frame)
+            indices = self.deriveFrame(frame)[0].indicesOf(numbers[frameRows])
+            found = frameRows[indices >= 0]
+            self.reviewStateOf(frame).markMany(
+                indices[indices >= 0], states[found], [notes[i] for i in found.tolist()]
+            )
+
+        self.frameNotes.clear()
+        for row in rows[notesStart:]:
+            self.frameNotes.setdefault(self.rowFrame(row), []).append(row["Note"])
+        return currentFrame, currentItem
+
+    def applyJournalEntries(self, entries):
+        # Replay autosave journal entries, return the frame and index of the
+        # last marked object or None
+        last = None
+        for entry in entries:
+            frame = entry.get("frame", 0)
+            if entry["action"] == "mark":
+                if not 0 <= frame < self.frameCount:
+                    continue
+                index = self.deriveFrame(frame)[0].indexOf(entry["object"])
+                if index >= 0:
+                    self.reviewStateOf(frame).mark(index, STATE_VALUES[entry["state"]], entry["note"])
+                    last = (frame, index)
+            elif entry["action"] == "nonLabel":
+                self.frameNotes.setdefault(frame, []).append(entry["note"])
+        return last
+
+    def writeProgress(self, path, currentIndex):
+        writeProgressCsv(path, self.progressRows(currentIndex))
+
+    def readProgress(self, path):
+        return self.applyProgressRows(readProgressCsv(path))
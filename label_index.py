@@ -0,0 +1,68 @@
+import numpy as np
+
+# Label ids up to this value, or up to DIRECT_FACTOR times the object count,
+# are looked up in a direct array; sparser masks use binary search so memory
+# stays proportional to the number of objects, not the largest id
+DIRECT_MIN_SIZE = 1 << 16
+DIRECT_FACTOR = 4
+
+
+def _runStarts(values):
+    # Positions where a flat array changes value; label arrays are made of
+    # long runs, so work per run is far less than work per pixel
+    changes = np.empty(len(values), dtype=bool)
+    changes[:1] = True
+    np.not_equal(values[1:], values[:-1], out=changes[1:])
+    return np.flatnonzero(changes)
+
+
+def maskIds(maskArray, chunkPixels=1 << 22):
+    # Sorted non-zero labels of a mask, from the values of its runs
+    height, width = maskArray.shape
+    step = max(1, chunkPixels // max(width, 1))
+    parts = []
+    for top in range(0, height, step):
+        values = np.asarray(maskArray[top:top + step]).ravel()
+        parts.append(np.unique(values[_runStarts(values)]))
+    ids = np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=maskArray.dtype)
+    return ids[ids != 0]
+
+
+class LabelIndex:
+    # Maps raw label ids to dense indices 0..N-1 in the order of the sorted
+    # ids, -1 for the background and unknown labels
+
+    def __init__(self, ids):
+        self.ids = ids
+        maxId = int(ids[-1]) if len(ids) else 0
+        if maxId < max(DIRECT_MIN_SIZE, DIRECT_FACTOR * len(ids)):
+            # One extra -1 at the end catches larger ids when clipping
+            self.direct = np.full(maxId + 2, -1, dtype=np.int32)
+            self.direct[ids] = np.arange(len(ids), dtype=np.int32)
+        else:
+            self.direct = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def lookup(self, values):
+        values = np.asarray(values)
+        if self.direct is not None:
+            return np.take(self.direct, values, mode="clip")
+        flat = values.ravel()
+        if not len(flat) or not len(self.ids):
+            return np.full(values.shape, -1, dtype=np.int32)
+        starts = _runStarts(flat)
+        runValues = flat[starts]
+        positions = np.minimum(np.searchsorted(self.ids, runValues), len(self.ids) - 1)
+        dense = np.where(self.ids[positions] == runValues, positions, -1).astype(np.int32)
+        lengths = np.diff(np.append(starts, len(flat)))
+        return np.repeat(dense, lengths).reshape(values.shape)
+
+    def indexOf(self, obj_id):
+        if self.direct is not None:
+            return int(self.direct[min(max(obj_id, 0), len(self.direct) - 1)])
+        position = int(np.searchsorted(self.ids, obj_id))
+        if position < len(self.ids) and self.ids[position] == obj_id:
+            return position
+        return -1
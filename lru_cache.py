@@ -0,0 +1,45 @@
+from collections import OrderedDict
+
+
+class LRUCache:
+    # Least recently used entries are evicted once the summed cost of all
+    # entries exceeds maxCost. costOf defaults to counting entries.
+
+    def __init__(self, maxCost, costOf=None):
+        self.maxCost = maxCost
+        self.costOf = costOf or (lambda value: 1)
+        self.entries = OrderedDict()
+        self.totalCost = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        if key not in self.entries:
+            return default
+        self.entries.move_to_end(key)
+        return self.entries[key][0]
+
+    def put(self, key, value):
+        if key in self.entries:
+            self.totalCost -= self.entries.pop(key)[1]
+        cost = self.costOf(value)
+        self.entries[key] = (value, cost)
+        self.totalCost += cost
+        while self.totalCost > self.maxCost and len(self.entries) > 1:
+            _, (_, evictedCost) = self.entries.popitem(last=False)
+            self.totalCost -= evictedCost
+
+    def pop(self, key, default=None):
+        if key not in self.entries:
+            return default
+        value, cost = self.entries.pop(key)
+        self.totalCost -= cost
+        return value
+
+    def clear(self):
+        self.entries.clear()
+        self.totalCost = 0
@@ -1,8 +1,64 @@
+import time
+
+START = time.perf_counter()
+
+import os
 import sys
+from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import QApplication
-from image_viewer import ImageViewer
+import profiler
+
+# Per-phase startup times are printed to stderr with --timing or when this
+# variable is set
+TIMING_ENV = "LABEL_CHECKER_TIMING"
+FLAGS = ("--timing", "--profile")
+
+
+class PhaseTimer:
+    def __init__(self, start):
+        self.start = self.last = start
+        self.phases = []
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def report(self):
+        for name, seconds in self.phases:
+            print(f"{name:<14} {seconds * 1000:8.1f} ms", file=sys.stderr)
+        print(f"{'total':<14} {(self.last - self.start) * 1000:8.1f} ms", file=sys.stderr)
+
+
+def afterFirstPaint(timer, viewer, paths, showTiming):
+    timer.mark("first paint")
+    # Open what was given on the command line, otherwise load the analysis
+    # stack while the window waits for input
+    if paths:
+        viewer.openPaths(paths)
+        timer.mark("open")
+    else:
+        viewer.warmUp()
+        timer.mark("warm up")
+    if showTiming:
+        timer.report()
+
 
 if __name__ == "__main__":
+    timer = PhaseTimer(START)
+    timer.mark("qt import")
+    from image_viewer import ImageViewer
+
+    timer.mark("viewer import")
     app = QApplication(sys.argv)
+    # Qt removes its own options from sys.argv, what is left are our paths
+    args = sys.argv[1:]
+    showTiming = "--timing" in args or bool(os.environ.get(TIMING_ENV))
+    if "--profile" in args or os.environ.get(profiler.PROFILE_ENV):
+        profiler.enable()
+    paths = [arg for arg in args if arg not in FLAGS]
+    timer.mark("application")
     ex = ImageViewer()
+    timer.mark("window")
+    QTimer.singleShot(0, lambda: afterFirstPaint(timer, ex, paths, showTiming))
     sys.exit(app.exec_())
@@ -0,0 +1,75 @@
+import hashlib
+import os
+import threading
+import zipfile
+import numpy as np
+from object_table import ObjectTable
+from overlay import buildPalette
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".label_checker", "cache")
+CACHE_VERSION = 3
+
+
+def maskDigest(maskArray):
+    maskArray = np.ascontiguousarray(maskArray)
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{CACHE_VERSION}|{maskArray.dtype.str}|{maskArray.shape}".encode("utf-8"))
+    digest.update(memoryview(maskArray).cast("B"))
+    return digest.hexdigest()
+
+
+def cachePath(digest):
+    return os.path.join(CACHE_DIR, digest + ".npz")
+
+
+def loadDerivedData(digest):
+    path = cachePath(digest)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            if int(data["version"]) != CACHE_VERSION or str(data["digest"]) != digest:
+                return None
+            table = ObjectTable(*(data[name] for name in ObjectTable.fields))
+            palette = data["palette"]
+    except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile):
+        # Unreadable, truncated or outdated cache entries are simply rebuilt
+        return None
+    return table, palette
+
+
+def saveDerivedData(digest, table, palette):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = cachePath(digest)
+    # Batch workers and prefetch threads may save the same mask at once
+    temporaryPath = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporaryPath, "wb") as file:
+            np.savez(
+                file,
+                version=CACHE_VERSION,
+                digest=digest,
+                palette=palette,
+                **table.toArrays(),
+            )
+        os.replace(temporaryPath, path)
+    except Exception:
+        if os.path.exists(temporaryPath):
+            os.remove(temporaryPath)
+        raise
+
+
+def deriveMaskData(maskArray):
+    # Object table and palette for a mask, from the sidecar cache when the
+    # mask content is unchanged since the last time it was opened
+    digest = maskDigest(maskArray)
+    cached = loadDerivedData(digest)
+    if cached is not None:
+        return cached
+    table = ObjectTable.fromMask(maskArray)
+    palette = buildPalette(len(table), seed=int(digest[:8], 16))
+    try:
+        saveDerivedData(digest, table, palette)
+    except OSError:
+        pass
+    return table, palette
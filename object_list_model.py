@@ -0,0 +1,102 @@
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex
+from PyQt5.QtGui import QColor
+from review_fields import STATE_YES, STATE_NO
+
+# Per-object metrics the object list can be sorted and filtered by
+METRICS = {
+    "label": "Label",
+    "area": "Area",
+    "bboxFill": "BBox fill",
+    "perimeter": "Perimeter",
+    "elongation": "Elongation",
+    "touchesBorder": "Touches border",
+}
+
+
+class ObjectListModel(QAbstractListModel):
+    # Rows are generated on demand from the object table. order maps a row to
+    # its dense object index, so the list can be sorted and filtered without
+    # touching the table; rowOfIndex is its inverse, -1 for hidden objects.
+    stateColors = {STATE_YES: QColor("green"), STATE_NO: QColor("red")}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.objectTable = None
+        self.reviewState = None
+        self.metric = "label"
+        self.order = ()
+        self.rowOfIndex = ()
+
+    def setObjectTable(self, objectTable, reviewState):
+        self.objectTable = objectTable
+        self.reviewState = reviewState
+        self.setOrder(objectTable.sortedBy("label"), "label")
+
+    def setOrder(self, order, metric):
+        self.beginResetModel()
+        self.order = order
+        self.metric = metric
+        self.rowOfIndex = self.objectTable.rowsOf(order)
+        self.endResetModel()
+
+    def clear(self):
+        self.beginResetModel()
+        self.objectTable = None
+        self.order = ()
+        self.rowOfIndex = ()
+        self.endResetModel()
+
+    def setReviewState(self, reviewState):
+        self.reviewState = reviewState
+        self.refreshRows(0, self.rowCount() - 1)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() or self.objectTable is None:
+            return 0
+        return len(self.order)
+
+    def indexAt(self, row):
+        return int(self.order[row])
+
+    def rowOf(self, index):
+        # -1 for hidden objects and indices outside the table, as for an
+        # empty mask
+        if not 0 <= index < len(self.rowOfIndex):
+            return -1
+        return int(self.rowOfIndex[index])
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        objectIndex = self.order[index.row()]
+        if role == Qt.DisplayRole:
+            return self.displayText(objectIndex)
+        if role == Qt.BackgroundRole:
+            return self.stateColors.get(int(self.reviewState.states[objectIndex]))
+        return None
+
+    def displayText(self, objectIndex):
+        obj = int(self.objectTable.ids[objectIndex])
+        pixel_count = int(self.objectTable.pixelCounts[objectIndex])
+        text = f"Object {obj}: {pixel_count} pixels"
+        if self.metric == "touchesBorder":
+            if self.objectTable.touchesBorder[objectIndex]:
+                text += ", touches border"
+        elif self.metric not in ("label", "area"):
+            value = self.objectTable.metric(self.metric)[objectIndex]
+            text += f", {METRICS[self.metric].lower()} {value:.2f}"
+        return text
+
+    def refreshRows(self, first, last):
+        if last < first:
+            return
+        self.dataChanged.emit(self.index(first), self.index(last), [Qt.BackgroundRole])
+
+
+class CandidateListModel(ObjectListModel):
+    # Unlabelled blobs found by the candidate detector, numbered in scan order
+
+    def displayText(self, objectIndex):
+        row, col = self.objectTable.centroid(objectIndex)
+        pixel_count = int(self.objectTable.pixelCounts[objectIndex])
+        return f"Candidate {objectIndex + 1}: {pixel_count} pixels at ({int(col)}, {int(row)})"
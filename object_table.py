@@ -0,0 +1,189 @@
+import numpy as np
+from label_index import LabelIndex, maskIds
+
+
+class ObjectTable:
+    # Per-object data for every label in a mask, built in a single scan.
+    # bboxes rows are (minRow, minCol, maxRow, maxCol), inclusive.
+    # centroids rows are (row, col).
+    # perimeters count the pixel edges shared with another label or the border.
+    # elongations are the major/minor axis ratio from the second moments.
+    # labelIndex maps a label to its dense row in the table, -1 if absent.
+    # Every per-object array is indexed by that dense row; raw labels are
+    # only needed to read the mask and to write progress files.
+    fields = ("ids", "pixelCounts", "bboxes", "centroids", "perimeters", "elongations", "touchesBorder")
+
+    def __init__(self, ids, pixelCounts, bboxes, centroids, perimeters, elongations, touchesBorder):
+        self.ids = ids
+        self.pixelCounts = pixelCounts
+        self.bboxes = bboxes
+        self.centroids = centroids
+        self.perimeters = perimeters
+        self.elongations = elongations
+        self.touchesBorder = touchesBorder
+        boxAreas = (bboxes[:, 2] - bboxes[:, 0] + 1).astype(np.int64) * (bboxes[:, 3] - bboxes[:, 1] + 1)
+        self.bboxFill = pixelCounts / np.maximum(boxAreas, 1)
+        self.sortedIndices = {}
+        self.labelIndex = LabelIndex(ids)
+
+    @classmethod
+    def fromMask(cls, maskArray, chunkPixels=1 << 22):
+        # Scan the mask in blocks of rows so temporaries stay bounded. Labels
+        # are relabelled to dense indices first, so the accumulators have one
+        # entry per object whatever the largest label is.
+        height, width = maskArray.shape
+        labelIndex = LabelIndex(maskIds(maskArray, chunkPixels))
+        size = len(labelIndex)
+
+        pixelCounts = np.zeros(size, dtype=np.int64)
+        rowSums = np.zeros(size, dtype=np.float64)
+        colSums = np.zeros(size, dtype=np.float64)
+        rowSquares = np.zeros(size, dtype=np.float64)
+        colSquares = np.zeros(size, dtype=np.float64)
+        rowCols = np.zeros(size, dtype=np.float64)
+        edges = np.zeros(size, dtype=np.float64)
+        minRows = np.full(size, height, dtype=np.intp)
+        minCols = np.full(size, width, dtype=np.intp)
+        maxRows = np.full(size, -1, dtype=np.intp)
+        maxCols = np.full(size, -1, dtype=np.intp)
+
+        step = max(1, chunkPixels // max(width, 1))
+        for top in range(0, height, step):
+            block = maskArray[top:top + step]
+            rows, cols = np.nonzero(block)
+            values = block[rows, cols]
+            labels = labelIndex.lookup(values).astype(np.intp)
+
+            # Block with its neighbouring rows and a zero frame around it
+            padded = np.zeros((len(block) + 2, width + 2), dtype=maskArray.dtype)
+            padded[1:-1, 1:-1] = block
+            if top:
+                padded[0, 1:-1] = maskArray[top - 1]
+            if top + len(block) < height:
+                padded[-1, 1:-1] = maskArray[top + len(block)]
+            boundary = (padded[rows, cols + 1] != values).astype(np.uint8)
+            boundary += padded[rows + 2, cols + 1] != values
+            boundary += padded[rows + 1, cols] != values
+            boundary += padded[rows + 1, cols + 2] != values
+
+            rows += top
+            pixelCounts += np.bincount(labels, minlength=size)
+            rowSums += np.bincount(labels, weights=rows, minlength=size)
+            colSums += np.bincount(labels, weights=cols, minlength=size)
+            rowSquares += np.bincount(labels, weights=rows * rows, minlength=size)
+            colSquares += np.bincount(labels, weights=cols * cols, minlength=size)
+            rowCols += np.bincount(labels, weights=rows * cols, minlength=size)
+            edges += np.bincount(labels, weights=boundary, minlength=size)
+            np.minimum.at(minRows, labels, rows)
+            np.minimum.at(minCols, labels, cols)
+            np.maximum.at(maxRows, labels, rows)
+            np.maximum.at(maxCols, labels, cols)
+
+        bboxes = np.stack([minRows, minCols, maxRows, maxCols], axis=1).astype(np.int32)
+        centroids = np.stack([rowSums / pixelCounts, colSums / pixelCounts], axis=1)
+        meanRows, meanCols = centroids.T
+
+        # Eigenvalues of the coordinate covariance, each pixel counted as a
+        # unit square so single rows and columns stay finite
+        rowVariance = rowSquares / pixelCounts - meanRows ** 2 + 1 / 12
+        colVariance = colSquares / pixelCounts - meanCols ** 2 + 1 / 12
+        covariance = rowCols / pixelCounts - meanRows * meanCols
+        middle = (rowVariance + colVariance) / 2
+        spread = np.sqrt(((rowVariance - colVariance) / 2) ** 2 + covariance ** 2)
+        elongations = np.sqrt((middle + spread) / np.maximum(middle - spread, 1 / 12))
+
+        touchesBorder = (
+            (bboxes[:, 0] == 0)
+            | (bboxes[:, 1] == 0)
+            | (bboxes[:, 2] == height - 1)
+            | (bboxes[:, 3] == width - 1)
+        )
+        return cls(
+            labelIndex.ids,
+            pixelCounts,
+            bboxes,
+            centroids,
+            edges,
+            elongations,
+            touchesBorder,
+        )
+
+    def metric(self, name):
+        return {
+            "label": self.ids,
+            "area": self.pixelCounts,
+            "bboxFill": self.bboxFill,
+            "perimeter": self.perimeters,
+            "elongation": self.elongations,
+            "touchesBorder": self.touchesBorder,
+        }[name]
+
+    def sortedBy(self, name):
+        # Dense indices in ascending metric order, sorted once per metric
+        order = self.sortedIndices.get(name)
+        if order is None:
+            order = self.sortedIndices[name] = np.argsort(self.metric(name), kind="stable")
+        return order
+
+    def pixelCountRange(self, low=None, high=None):
+        # Dense indices with low <= pixel count <= high, by binary search over
+        # an index sorted by pixel count
+        order = self.sortedBy("area")
+        areas = self.pixelCounts[order]
+        first = 0 if low is None else np.searchsorted(areas, low, side="left")
+        last = len(areas) if high is None else np.searchsorted(areas, high, side="right")
+        return order[first:last]
+
+    def select(self, obj_id=None, minPixels=None, maxPixels=None):
+        # Mask over dense indices for an exact label and a pixel count range
+        keep = np.zeros(len(self.ids), dtype=bool)
+        if obj_id is None:
+            keep[self.pixelCountRange(minPixels, maxPixels)] = True
+            return keep
+        index = self.indexOf(obj_id)
+        if index >= 0:
+            count = self.pixelCounts[index]
+            keep[index] = (minPixels is None or count >= minPixels) and (
+                maxPixels is None or count <= maxPixels
+            )
+        return keep
+
+    def orderBy(self, name, descending=False, low=None, high=None, keep=None):
+        # Dense indices sorted by a metric, keeping only values within
+        # [low, high] and, if given, where keep is set
+        values = self.metric(name)
+        order = self.sortedBy(name)
+        if descending:
+            order = order[::-1]
+        keep = np.ones(len(values), dtype=bool) if keep is None else keep.copy()
+        if low is not None:
+            keep &= values >= low
+        if high is not None:
+            keep &= values <= high
+        return order[keep[order]]
+
+    def rowsOf(self, order):
+        # Inverse of a list order: the row of every dense index, -1 if hidden
+        rows = np.full(len(self), -1, dtype=np.intp)
+        rows[order] = np.arange(len(order))
+        return rows
+
+    def toArrays(self):
+        return {name: getattr(self, name) for name in self.fields}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def indexOf(self, obj_id):
+        return self.labelIndex.indexOf(int(obj_id))
+
+    def indicesOf(self, obj_ids):
+        return self.labelIndex.lookup(np.asarray(obj_ids, dtype=np.int64))
+
+    def bbox(self, index):
+        minRow, minCol, maxRow, maxCol = self.bboxes[index]
+        return int(minRow), int(minCol), int(maxRow), int(maxCol)
+
+    def centroid(self, index):
+        row, col = self.centroids[index]
+        return float(row), float(col)
@@ -0,0 +1,50 @@
+import numpy as np
+
+
+def buildPalette(count, seed=None):
+    # Colour of every dense object index, shifted by one so that row 0 is
+    # the background. The same seed always gives the same colours.
+    palette = np.zeros((count + 1, 3), dtype=np.uint8)
+    palette[1:] = np.random.default_rng(seed).integers(256, size=(count, 3))
+    return palette
+
+
+def buildLut(palette, alpha):
+    # Row 0 is the background and stays fully transparent
+    lut = np.empty((len(palette), 4), dtype=np.uint8)
+    lut[:, :3] = palette
+    lut[:, 3] = alpha
+    lut[0] = 0
+    return lut
+
+
+def colorizeMask(maskArray, labelIndex, lut):
+    # lut rows follow the palette: dense index + 1, background and unknown
+    # labels on row 0
+    dense = labelIndex.lookup(maskArray)
+    dense += 1
+    return lut[dense]
+
+
+def renderObjectCrop(maskArray, bbox, obj_id, color, alpha):
+    # RGBA patch covering only the object's bounding box
+    minRow, minCol, maxRow, maxCol = bbox
+    crop = maskArray[minRow:maxRow + 1, minCol:maxCol + 1] == obj_id
+    patch = np.zeros(crop.shape + (4,), dtype=np.uint8)
+    patch[crop] = (*color, alpha)
+    return patch
+
+
+def displayScale(dtype):
+    # Factor mapping the full range of dtype onto 0..255
+    if dtype == np.bool_:
+        return 255.0
+    if np.issubdtype(dtype, np.integer):
+        return 255.0 / np.iinfo(dtype).max
+    return 255.0
+
+
+def toDisplay8(array, scale):
+    if array.dtype == np.uint8:
+        return array
+    return np.clip(array * np.float32(scale), 0, 255).astype(np.uint8)
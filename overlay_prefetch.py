@@ -0,0 +1,50 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from lru_cache import LRUCache
+
+PREFETCH_RADIUS = 8
+OVERLAY_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class OverlayPrefetcher:
+    # Object crops and their bounding boxes for a LabelPair, kept in an LRU
+    # cache bounded in bytes. Neighbours of the current object are rendered
+    # on a background thread so Next/Previous only have to look them up.
+
+    def __init__(self, pair, maxBytes=OVERLAY_CACHE_BYTES):
+        self.pair = pair
+        self.cache = LRUCache(maxBytes, lambda entry: entry[0].nbytes)
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def crop(self, index):
+        with self.lock:
+            entry = self.cache.get(index)
+        if entry is None:
+            entry = self.render(index)
+        return entry
+
+    def render(self, index):
+        entry = self.pair.renderObjectCrop(index)
+        with self.lock:
+            self.cache.put(index, entry)
+        return entry
+
+    def prefetch(self, indices):
+        # Only the latest request is worked on, older ones stop at the next object
+        self.generation += 1
+        self.executor.submit(self._renderMissing, list(indices), self.generation)
+
+    def _renderMissing(self, indices, generation):
+        for index in indices:
+            if generation != self.generation:
+                return
+            with self.lock:
+                cached = index in self.cache
+            if not cached:
+                self.render(index)
+
+    def close(self):
+        self.generation += 1
+        self.executor.shutdown(wait=False)
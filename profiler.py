@@ -0,0 +1,152 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+# Opt-in timing of the interactive hot paths. When enabled, every profiled
+# call records its wall time and the peak traced memory allocated while it
+# ran into a ring buffer; the debug panel shows rolling percentiles and the
+# buffer can be written as a Chrome trace (chrome://tracing, Perfetto).
+# Disabled, a profiled call costs one global lookup.
+
+PROFILE_ENV = "LABEL_CHECKER_PROFILE"
+RING_SIZE = 8192
+
+_enabled = False
+_records = deque(maxlen=RING_SIZE)
+_origin = time.perf_counter()
+_local = threading.local()
+
+
+class Record:
+    __slots__ = ("name", "start", "duration", "allocated", "thread")
+
+    def __init__(self, name, start, duration, allocated, thread):
+        self.name = name
+        self.start = start
+        self.duration = duration
+        self.allocated = allocated
+        self.thread = thread
+
+
+def enable():
+    global _enabled
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _enabled = True
+
+
+def isEnabled():
+    return _enabled
+
+
+def clear():
+    _records.clear()
+
+
+class Span:
+    # Context manager timing one call. Nested spans hand their peak to the
+    # enclosing one. tracemalloc keeps a single peak for the whole process, so
+    # the figure is approximate while spans run in other threads too.
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        if not _enabled:
+            self.start = None
+            return self
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1].peak = max(stack[-1].peak, peak)
+        tracemalloc.reset_peak()
+        self.base = self.peak = current
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is None:
+            return False
+        duration = time.perf_counter() - self.start
+        stack = _local.stack
+        stack.pop()
+        self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+        if stack:
+            stack[-1].peak = max(stack[-1].peak, self.peak)
+        tracemalloc.reset_peak()
+        _records.append(
+            Record(self.name, self.start, duration, self.peak - self.base, threading.get_ident())
+        )
+        return False
+
+
+def profiled(name=None):
+    # Decorator form of Span for methods that are not connected to signals
+    # with arguments (PyQt would pass those on to the wrapper)
+    def decorate(func):
+        spanName = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(spanName):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def _percentile(values, fraction):
+    # Nearest rank on sorted values
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def summary():
+    # name -> (calls, p50 s, p95 s, max s, p95 allocated bytes) over the
+    # records still in the ring buffer
+    byName = {}
+    for record in list(_records):
+        byName.setdefault(record.name, []).append(record)
+    rows = {}
+    for name, records in sorted(byName.items()):
+        durations = sorted(record.duration for record in records)
+        allocated = sorted(record.allocated for record in records)
+        rows[name] = (
+            len(records),
+            _percentile(durations, 0.5),
+            _percentile(durations, 0.95),
+            durations[-1],
+            _percentile(allocated, 0.95),
+        )
+    return rows
+
+
+def writeTrace(path):
+    # Chrome trace event format, complete ("X") events in microseconds
+    pid = os.getpid()
+    events = [
+        {
+            "name": record.name,
+            "ph": "X",
+            "ts": (record.start - _origin) * 1e6,
+            "dur": record.duration * 1e6,
+            "pid": pid,
+            "tid": record.thread,
+            "args": {"allocatedBytes": record.allocated},
+        }
+        for record in list(_records)
+    ]
+    temporaryPath = path + ".tmp"
+    with open(temporaryPath, mode="w", encoding="utf-8") as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+    os.replace(temporaryPath, path)
+    return len(events)
@@ -0,0 +1,92 @@
+import os
+from PyQt5.QtWidgets import (
+    QWidget,
+    QVBoxLayout,
+    QHBoxLayout,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QHeaderView,
+    QFileDialog,
+    QMessageBox,
+)
+from PyQt5.QtCore import Qt, QTimer
+import profiler
+
+REFRESH_MS = 1000
+COLUMNS = ["Call", "Calls", "p50 ms", "p95 ms", "Max ms", "p95 alloc KB"]
+
+
+class ProfilerPanel(QWidget):
+    # Rolling percentiles of the profiled calls, refreshed while shown
+
+    def __init__(self, parent=None):
+        super().__init__(parent, Qt.Window)
+        self.setWindowTitle("Profiler")
+        layout = QVBoxLayout(self)
+
+        self.table = QTableWidget(0, len(COLUMNS), self)
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        self.btnExport = QPushButton("Export Trace", self)
+        self.btnExport.clicked.connect(self.exportTrace)
+        buttons.addWidget(self.btnExport)
+        self.btnClear = QPushButton("Clear", self)
+        self.btnClear.clicked.connect(self.clear)
+        buttons.addWidget(self.btnClear)
+        layout.addLayout(buttons)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.resize(560, 320)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start(REFRESH_MS)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        rows = profiler.summary()
+        self.table.setRowCount(len(rows))
+        for row, (name, (calls, p50, p95, longest, allocated)) in enumerate(rows.items()):
+            values = [
+                name,
+                str(calls),
+                f"{p50 * 1000:.1f}",
+                f"{p95 * 1000:.1f}",
+                f"{longest * 1000:.1f}",
+                f"{allocated / 1024:.0f}",
+            ]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+
+    def clear(self):
+        profiler.clear()
+        self.refresh()
+
+    def exportTrace(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export trace", "label_checker_trace.json", "JSON Files (*.json);;All Files (*)"
+        )
+        if not path:
+            return
+        try:
+            count = profiler.writeTrace(path)
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Failed to write trace: {e}")
+            return
+        QMessageBox.information(
+            self, "Trace", f"{count} calls written to {os.path.basename(path)}."
+        )
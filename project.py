@@ -0,0 +1,198 @@
+import csv
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+MANIFEST_NAME = "manifest.csv"
+STATUS_NAME = "label_checker_project.json"
+# Status files of projects whose folder cannot be written
+FALLBACK_STATUS_DIR = os.path.join(os.path.expanduser("~"), ".label_checker", "projects")
+MASK_SUFFIXES = ("_mask", "_masks", "_label", "_labels")
+TIFF_EXTENSIONS = (".tif", ".tiff")
+
+STATUS_PENDING = "pending"
+STATUS_IN_PROGRESS = "in progress"
+STATUS_DONE = "done"
+
+
+def _tiffFiles(directory):
+    return sorted(
+        name for name in os.listdir(directory) if name.lower().endswith(TIFF_EXTENSIONS)
+    )
+
+
+def discoverPairs(directory):
+    # images/ and masks/ folders with matching file names, or a flat folder
+    # where each mask is named after its image plus one of MASK_SUFFIXES
+    imageDir = os.path.join(directory, "images")
+    maskDir = os.path.join(directory, "masks")
+    if os.path.isdir(imageDir) and os.path.isdir(maskDir):
+        masks = set(_tiffFiles(maskDir))
+        return [
+            (os.path.join(imageDir, name), os.path.join(maskDir, name))
+            for name in _tiffFiles(imageDir)
+            if name in masks
+        ]
+
+    files = _tiffFiles(directory)
+    stems = {os.path.splitext(name)[0]: name for name in files}
+    pairs = []
+    for name in files:
+        stem = os.path.splitext(name)[0]
+        if stem.endswith(MASK_SUFFIXES):
+            continue
+        for suffix in MASK_SUFFIXES:
+            if stem + suffix in stems:
+                pairs.append(
+                    (os.path.join(directory, name), os.path.join(directory, stems[stem + suffix]))
+                )
+                break
+    return pairs
+
+
+def orderPair(paths):
+    # Image and mask of two files given together, told apart by MASK_SUFFIXES
+    # and otherwise taken in the given order
+    first, second = paths
+    if os.path.splitext(os.path.basename(first))[0].endswith(MASK_SUFFIXES):
+        return second, first
+    return first, second
+
+
+def readManifest(path):
+    # CSV with "image" and "mask" columns, relative paths are taken from the manifest folder
+    directory = os.path.dirname(os.path.abspath(path))
+    with open(path, mode="r", encoding="utf-8-sig") as file:
+        return [
+            (os.path.join(directory, row["image"]), os.path.join(directory, row["mask"]))
+            for row in csv.DictReader(file)
+        ]
+
+
+def projectPairs(path):
+    # Pairs of a project folder or manifest, and the folder the project lives in
+    if os.path.isdir(path):
+        manifestPath = os.path.join(path, MANIFEST_NAME)
+        pairs = readManifest(manifestPath) if os.path.exists(manifestPath) else discoverPairs(path)
+        return pairs, path
+    return readManifest(path), os.path.dirname(os.path.abspath(path))
+
+
+def preparePair(imagePath, maskPath):
+    # Everything loadImage and the worker would do, ready to be displayed
+    from label_core import LabelPair
+
+    pair = LabelPair(imagePath, maskPath)
+    pair.extractObjects()
+    for _ in pair.buildPyramids():
+        pass
+    return pair
+
+
+class Project:
+    # A queue of image/mask pairs with a review status per pair. The pair after
+    # the current one is prepared on a background thread while it is reviewed.
+
+    def __init__(self, pairs, statusPath):
+        self.pairs = pairs
+        self.statusPath = statusPath
+        self.currentIndex = -1
+        self.prefetched = {}
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        key = hashlib.sha1(os.path.abspath(statusPath).encode("utf-8")).hexdigest()[:16]
+        self.fallbackPath = os.path.join(FALLBACK_STATUS_DIR, key + ".json")
+        self.status = {}
+        # The per-user copy only exists while the project folder is read-only
+        for path in (self.fallbackPath, statusPath):
+            if os.path.exists(path):
+                try:
+                    with open(path, mode="r", encoding="utf-8") as file:
+                        self.status = json.load(file)
+                    break
+                except (OSError, ValueError):
+                    continue
+
+    @classmethod
+    def open(cls, path):
+        pairs, directory = projectPairs(path)
+        return cls(pairs, os.path.join(directory, STATUS_NAME))
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def statusOf(self, index):
+        entry = self.status.get(self.pairs[index][0])
+        return entry["status"] if entry else STATUS_PENDING
+
+    def setStatus(self, index, status, checked=None, total=None):
+        entry = self.status.setdefault(self.pairs[index][0], {"status": STATUS_PENDING})
+        if entry["status"] == status and checked is None:
+            return
+        entry["status"] = status
+        if checked is not None:
+            entry["checked"] = checked
+            entry["total"] = total
+        # Shared or read-only datasets get the status file in the user's home
+        # folder instead, and if that fails too it is only kept in memory
+        try:
+            self.writeStatus(self.statusPath)
+        except OSError:
+            try:
+                os.makedirs(FALLBACK_STATUS_DIR, exist_ok=True)
+                self.writeStatus(self.fallbackPath)
+            except OSError:
+                pass
+            return
+        if os.path.exists(self.fallbackPath):
+            try:
+                os.remove(self.fallbackPath)
+            except OSError:
+                pass
+
+    def writeStatus(self, path):
+        temporaryPath = path + ".tmp"
+        try:
+            with open(temporaryPath, mode="w", encoding="utf-8") as file:
+                json.dump(self.status, file, indent=2)
+            os.replace(temporaryPath, path)
+        except OSError:
+            if os.path.exists(temporaryPath):
+                os.remove(temporaryPath)
+            raise
+
+    def nextIndex(self, after=None):
+        # Next pair other than after that is not done yet, wrapping around,
+        # None when there is no such pair
+        after = self.currentIndex if after is None else after
+        for step in range(1, len(self.pairs) + 1):
+            index = (after + step) % len(self.pairs)
+            if index != after and self.statusOf(index) != STATUS_DONE:
+                return index
+        return None
+
+    def prefetch(self, index):
+        if index is None or index in self.prefetched:
+            return
+        self.prefetched[index] = self.executor.submit(preparePair, *self.pairs[index])
+
+    def takePair(self, index):
+        # The prepared LabelPair for index, waiting for a prefetch still running,
+        # or None when it was never prefetched or failed to load
+        future = self.prefetched.pop(index, None)
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except Exception:
+            return None
+
+    def pathsInUse(self):
+        indices = list(self.prefetched) + [self.currentIndex]
+        return [path for index in indices if 0 <= index < len(self.pairs) for path in self.pairs[index]]
+
+    def close(self):
+        for future in self.prefetched.values():
+            future.cancel()
+        self.prefetched.clear()
+        self.executor.shutdown(wait=False)
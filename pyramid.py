@@ -0,0 +1,50 @@
+import threading
+import numpy as np
+
+TILE_SIZE = 512
+
+
+def halve(array, smooth):
+    # Next pyramid level: 2x2 block mean for images, nearest sample for labels
+    if not smooth:
+        return np.ascontiguousarray(array[::2, ::2])
+    height, width = array.shape[:2]
+    rows = np.arange(0, height, 2)
+    cols = np.arange(0, width, 2)
+    nextRows = np.minimum(rows + 1, height - 1)
+    nextCols = np.minimum(cols + 1, width - 1)
+    total = array[np.ix_(rows, cols)].astype(np.float32)
+    total += array[np.ix_(nextRows, cols)]
+    total += array[np.ix_(rows, nextCols)]
+    total += array[np.ix_(nextRows, nextCols)]
+    total *= 0.25
+    if np.issubdtype(array.dtype, np.integer):
+        np.rint(total, out=total)
+    return total.astype(array.dtype)
+
+
+class ImagePyramid:
+    # Downsampled levels of an array, each half the size of the previous one.
+    # Levels are built on first use and shared between threads.
+
+    def __init__(self, base, smooth=True):
+        self.levels = [base]
+        self.smooth = smooth
+        self.shape = base.shape
+        self.lock = threading.Lock()
+        self.levelCount = 1
+        while max(self.shape[:2]) >> (self.levelCount - 1) > TILE_SIZE:
+            self.levelCount += 1
+
+    def level(self, index):
+        index = min(max(index, 0), self.levelCount - 1)
+        with self.lock:
+            while len(self.levels) <= index:
+                self.levels.append(halve(self.levels[-1], self.smooth))
+            return self.levels[index]
+
+    def levelForScale(self, scale):
+        # Coarsest level that still has at least one pixel per screen pixel
+        if scale >= 1:
+            return 0
+        return min(int(np.floor(np.log2(1 / scale))), self.levelCount - 1)
@@ -0,0 +1,17 @@
+from PyQt5.QtGui import QImage
+import numpy as np
+
+
+def arrayToQImage(array):
+    array = np.ascontiguousarray(array)
+    height, width = array.shape[:2]
+    if array.ndim == 2:
+        imageFormat = QImage.Format_Grayscale8
+    elif array.shape[2] == 3:
+        imageFormat = QImage.Format_RGB888
+    else:
+        imageFormat = QImage.Format_RGBA8888
+    image = QImage(array.data, width, height, array.strides[0], imageFormat)
+    # QImage does not own the buffer, keep the array alive alongside it
+    image.ndarray = array
+    return image
@@ -0,0 +1,14 @@
+# Review states and progress file columns. Kept apart from review_state so
+# the window can be built before numpy is imported.
+
+STATE_UNCHECKED = 0
+STATE_YES = 1
+STATE_NO = 2
+
+STATE_NAMES = {STATE_YES: "Yes", STATE_NO: "No"}
+STATE_VALUES = {name: state for state, name in STATE_NAMES.items()}
+
+PROGRESS_FIELDS = ["Object Number", "Object State", "Note"]
+
+# Leading column of progress files for multi-frame masks
+FRAME_FIELD = "Frame"
@@ -0,0 +1,91 @@
+import csv
+import numpy as np
+
+from review_fields import (
+    STATE_UNCHECKED,
+    STATE_YES,
+    STATE_NO,
+    STATE_NAMES,
+    STATE_VALUES,
+    PROGRESS_FIELDS,
+    FRAME_FIELD,
+)
+
+
+class ReviewState:
+    # Review state of every object keyed by its dense index in the object table.
+    # Notes are sparse, counts holds the number of objects in each state.
+
+    def __init__(self, objectCount):
+        self.states = np.zeros(objectCount, dtype=np.uint8)
+        self.notes = {}
+        self.counts = np.zeros(len(STATE_NAMES) + 1, dtype=np.int64)
+        self.counts[STATE_UNCHECKED] = objectCount
+
+    def __len__(self):
+        return len(self.states)
+
+    def clear(self):
+        self.states[:] = STATE_UNCHECKED
+        self.notes.clear()
+        self.counts[:] = 0
+        self.counts[STATE_UNCHECKED] = len(self.states)
+
+    def mark(self, index, state, note=""):
+        self.counts[self.states[index]] -= 1
+        self.counts[state] += 1
+        self.states[index] = state
+        if note:
+            self.notes[index] = note
+        else:
+            self.notes.pop(index, None)
+
+    def markMany(self, indices, states, notes=None):
+        indices = np.asarray(indices, dtype=np.intp)
+        self.states[indices] = states
+        self.counts = np.bincount(self.states, minlength=len(self.counts)).astype(np.int64)
+        if notes is not None:
+            for index, note in zip(indices.tolist(), notes):
+                if note:
+                    self.notes[index] = note
+                else:
+                    self.notes.pop(index, None)
+
+    def select(self, state=None, noteText=None):
+        # Mask over dense indices for a state and a case-insensitive note substring
+        keep = np.ones(len(self.states), dtype=bool)
+        if state is not None:
+            keep &= self.states == state
+        if noteText:
+            noteText = noteText.lower()
+            noted = np.zeros(len(self.states), dtype=bool)
+            noted[[index for index, note in self.notes.items() if noteText in note.lower()]] = True
+            keep &= noted
+        return keep
+
+    def checkedCount(self):
+        return int(len(self.states) - self.counts[STATE_UNCHECKED])
+
+    def progressRows(self, ids):
+        marked = np.flatnonzero(self.states)
+        return [
+            {
+                "Object Number": f"label_{ids[index]}",
+                "Object State": STATE_NAMES[self.states[index]],
+                "Note": self.notes.get(index, ""),
+            }
+            for index in marked.tolist()
+        ]
+
+
+def writeProgressCsv(path, rows):
+    fields = [FRAME_FIELD] + PROGRESS_FIELDS if rows and FRAME_FIELD in rows[0] else PROGRESS_FIELDS
+    with open(path, mode="w", newline="", encoding="utf-8-sig") as file:
+        writer = csv.DictWriter(file, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def readProgressCsv(path):
+    with open(path, mode="r", encoding="utf-8-sig") as file:
+        return list(csv.DictReader(file))
@@ -0,0 +1,125 @@
+from PyQt5.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem
+from PyQt5.QtCore import QRectF
+from PyQt5.QtGui import QPen, QPixmap, QPainter, QPainterPath
+import numpy as np
+from lru_cache import LRUCache
+from pyramid import TILE_SIZE
+from qt_image import arrayToQImage
+
+TILE_CACHE_BYTES = 128 * 1024 * 1024
+PATH_CACHE_ELEMENTS = 4 * 1024 * 1024
+
+
+class TiledImageItem(QGraphicsItem):
+    # Draws an ImagePyramid tile by tile, only for the exposed area and at the
+    # level matching the current zoom. renderTile turns a slice of a level
+    # into an 8-bit array that QImage understands.
+
+    def __init__(self, pyramid, renderTile, smooth=True):
+        super().__init__()
+        self.pyramid = pyramid
+        self.renderTile = renderTile
+        self.smooth = smooth
+        self.tiles = LRUCache(
+            TILE_CACHE_BYTES,
+            lambda pixmap: pixmap.width() * pixmap.height() * pixmap.depth() // 8,
+        )
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+
+    def boundingRect(self):
+        height, width = self.pyramid.shape[:2]
+        return QRectF(0, 0, width, height)
+
+    def tile(self, level, tileRow, tileCol):
+        key = (level, tileRow, tileCol)
+        pixmap = self.tiles.get(key)
+        if pixmap is None:
+            levelArray = self.pyramid.level(level)
+            region = levelArray[
+                tileRow * TILE_SIZE:(tileRow + 1) * TILE_SIZE,
+                tileCol * TILE_SIZE:(tileCol + 1) * TILE_SIZE,
+            ]
+            pixmap = QPixmap.fromImage(arrayToQImage(self.renderTile(region)))
+            self.tiles.put(key, pixmap)
+        return pixmap
+
+    def paint(self, painter, option, widget=None):
+        scale = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        level = self.pyramid.levelForScale(scale)
+        factor = 2 ** level
+        span = TILE_SIZE * factor
+
+        inverse, _ = painter.worldTransform().inverted()
+        visible = inverse.mapRect(QRectF(painter.viewport()))
+        exposed = option.exposedRect.intersected(visible).intersected(self.boundingRect())
+        if exposed.isEmpty():
+            return
+        firstRow, lastRow = int(exposed.top() // span), int(exposed.bottom() // span)
+        firstCol, lastCol = int(exposed.left() // span), int(exposed.right() // span)
+
+        painter.setClipRect(self.boundingRect())
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, self.smooth)
+        height, width = self.pyramid.level(level).shape[:2]
+        for tileRow in range(firstRow, lastRow + 1):
+            for tileCol in range(firstCol, lastCol + 1):
+                if tileRow * TILE_SIZE >= height or tileCol * TILE_SIZE >= width:
+                    continue
+                pixmap = self.tile(level, tileRow, tileCol)
+                target = QRectF(
+                    tileCol * span,
+                    tileRow * span,
+                    pixmap.width() * factor,
+                    pixmap.height() * factor,
+                )
+                painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
+
+
+class ContourItem(QGraphicsItem):
+    # Draws ObjectContours as thin vector outlines of constant screen width.
+    # Only objects whose bounding box reaches the visible area are painted and
+    # colorOf(index) is asked for every one, so recolouring is just update().
+
+    def __init__(self, contours, bboxes, shape, colorOf):
+        super().__init__()
+        self.contours = contours
+        self.bboxes = bboxes
+        self.shape = shape
+        self.colorOf = colorOf
+        self.paths = LRUCache(PATH_CACHE_ELEMENTS, lambda path: path.elementCount())
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+
+    def boundingRect(self):
+        height, width = self.shape[:2]
+        return QRectF(0, 0, width, height)
+
+    def path(self, index):
+        path = self.paths.get(index)
+        if path is None:
+            path = QPainterPath()
+            for x1, y1, x2, y2 in self.contours.segmentsOf(index).tolist():
+                path.moveTo(x1, y1)
+                path.lineTo(x2, y2)
+            self.paths.put(index, path)
+        return path
+
+    def paint(self, painter, option, widget=None):
+        inverse, _ = painter.worldTransform().inverted()
+        visible = inverse.mapRect(QRectF(painter.viewport())).intersected(option.exposedRect)
+        if visible.isEmpty():
+            return
+        minRows, minCols, maxRows, maxCols = self.bboxes.T
+        inView = np.flatnonzero(
+            (minCols <= visible.right())
+            & (maxCols + 1 >= visible.left())
+            & (minRows <= visible.bottom())
+            & (maxRows + 1 >= visible.top())
+        )
+
+        pens = {}
+        for index in inView.tolist():
+            color = self.colorOf(index)
+            pen = pens.get(color.rgba())
+            if pen is None:
+                pen = pens[color.rgba()] = QPen(color, 0)
+            painter.setPen(pen)
+            painter.drawPath(self.path(index))
@@ -1,29 +1,41 @@
 from PyQt5.QtCore import QObject, pyqtSignal
-import numpy as np
-from PIL import Image
+from profiler import profiled
 
 
 class Worker(QObject):
     finished = pyqtSignal()
     progress = pyqtSignal(int)
 
-    def __init__(self, maskArray, objects):
+    def __init__(self, pair):
         super().__init__()
-        self.maskArray = maskArray
-        self.objects = objects
-        self.objectColors = {}
+        self.pair = pair
 
+    @profiled()
     def run(self):
-        height, width = self.maskArray.shape
-        self.maskImageArray = np.zeros((height, width, 4), dtype=np.uint8)
+        # Build the downsampled levels ahead of the first zoomed out paint
+        for percent in self.pair.buildPyramids():
+            self.progress.emit(percent)
 
-        for i, obj in enumerate(self.objects):
-            color = (np.random.randint(256), np.random.randint(256), np.random.randint(256))
-            self.objectColors[obj] = color
-            self.maskImageArray[self.maskArray == obj] = (*color, 128)  # RGBA with low opacity
-            self.progress.emit(int((i + 1) / len(self.objects) * 100))
+        self.finished.emit()
 
-        maskImage = Image.fromarray(self.maskImageArray, "RGBA")
-        maskImage.save("all_objects_with_low_opacity.tiff")
 
-        self.finished.emit()
+class CandidateWorker(QObject):
+    # Looks for unlabelled foreground in the current frame of a pair and
+    # emits (pair, frame, table), with table None if detection failed or was
+    # skipped because another frame is shown by the time it starts
+    finished = pyqtSignal(object)
+
+    def __init__(self, pair):
+        super().__init__()
+        self.pair = pair
+        self.frame = pair.frame
+
+    @profiled()
+    def run(self):
+        table = None
+        if self.pair.frame == self.frame:
+            try:
+                table = self.pair.detectCandidates()
+            except Exception:
+                pass
+        self.finished.emit((self.pair, self.frame, table))